@@ -6,22 +6,51 @@ That bunch of functions mimic kubectl behaviour and options
 import os.path
 import sys
 import atexit
+import collections
 import tarfile
 import re
-import select
 import json
 import time
 import tempfile
+import concurrent.futures
+import functools
 import urllib3
 import kubernetes.client  # pylint: disable=import-error
 import kubernetes.config  # pylint: disable=import-error
 import kubernetes.stream  # pylint: disable=import-error
+import kubernetes.watch  # pylint: disable=import-error
+from kubectl import apiclient
 from kubectl import exceptions
+from kubectl import wsclient
+
+_json_loads = apiclient.json_loads
 
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 _temp_files = []
 _resource_cache = []
+_resource_by_name = {}
+_resource_by_kind = {}
+_resource_by_short = {}
+_discovery_cache_file = os.path.join(
+    os.path.expanduser('~'), '.kube', 'cache', 'kubectl-helper-discovery.json')
+_DISCOVERY_CACHE_TTL = 600
+_DISCOVERY_RETRY_INTERVAL = 30.0
+_last_discovery = 0.0  # pylint: disable=invalid-name
+_DISCOVERY_WORKERS = 16
+_CP_CLOSE_TIMEOUT = 10.0
+_CP_CHUNK_SIZE = 64 * 1024
+_apis = {}
+_pod_cache = collections.OrderedDict()
+_POD_CACHE_SIZE = 256
+_POD_CACHE_TTL = 2.0
+_WAIT_POLL_DELAY = 0.25
+_WAIT_POLL_MAX_DELAY = 8.0
+_TOP_METRICS = {
+    'pod': 'podmetrics', 'pods': 'podmetrics',
+    'node': 'nodemetrics', 'nodes': 'nodemetrics'}
+# word boundaries: before a capitalized word or after a lowercase letter/digit
+_CAMEL_RE = re.compile('(?<=.)(?=[A-Z][a-z])|(?<=[a-z0-9])(?=[A-Z])')
 
 
 def _cleanup_temp_files():
@@ -35,82 +64,154 @@ def _cleanup_temp_files():
     _temp_files = []
 
 
+@functools.lru_cache(maxsize=4096)
 def camel_to_snake(name: str) -> str:
     """Converts Camel-style string to Snake-style string"""
-    name = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
-    return re.sub('([a-z0-9])([A-Z])', r'\1_\2', name).lower()
+    return _CAMEL_RE.sub('_', name).lower()
 
 
+@functools.lru_cache(maxsize=4096)
 def snake_to_camel(name: str) -> str:
     """Converts Snake-style string to Camel-style string"""
     name = name.split('_')
     return name[0] + ''.join(ele.title() for ele in name[1:])
 
 
-def _read_bytes_from_wsclient(
-        ws_client: kubernetes.stream.ws_client.WSClient,
-        timeout: int = 0) -> (bytes, bytes, bool):
-    if not ws_client.sock.connected:
-        # pylint: disable=protected-access
-        ws_client._connected = False
-    if not ws_client.is_open():
-        return None, None, True
-    stdout_bytes = None
-    stderr_bytes = None
-    r, _, _ = select.select(
-        (ws_client.sock.sock, ), (), (), timeout)
-    if r:
-        op_code, frame = ws_client.sock.recv_data_frame(True)
-        if op_code == 0x8:
-            # pylint: disable=protected-access
-            ws_client._connected = False
-        elif op_code in (0x1, 0x2):
-            data = frame.data
-            if len(data) > 1:
-                channel = data[0]
-                data = data[1:]
-                if data:
-                    if channel == kubernetes.stream.ws_client.STDOUT_CHANNEL:
-                        stdout_bytes = data
-                    elif channel == kubernetes.stream.ws_client.STDERR_CHANNEL:
-                        stderr_bytes = data
-    return stdout_bytes, stderr_bytes, not ws_client.is_open()
+@functools.lru_cache(maxsize=None)
+def _api_client() -> kubernetes.client.ApiClient:
+    """Client shared by every API so that connections are reused between calls"""
+    return apiclient.ApiClient()
+
+
+def _api(name: str):
+    """Get the shared instance of a kubernetes.client API class"""
+    # keyed on the class name only, however _api() is called
+    api = _apis.get(name)
+    if api is None:
+        api = _apis.setdefault(
+            name, getattr(kubernetes.client, name)(_api_client()))
+    return api
+
+
+def _is_camel_case(body) -> bool:
+    """Tell whether body has no field (outside 'data') to convert"""
+    stack = [body]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if '_' in key:
+                    return False
+                if key != 'data' and isinstance(value, (dict, list, tuple)):
+                    stack.append(value)
+        elif isinstance(node, tuple):
+            return False
+        else:
+            stack.extend(
+                value for value in node if isinstance(value, (dict, list, tuple)))
+    return True
 
 
 def _prepare_body(body):
-    """Ensure fields are in Camel Case"""
+    """Get a copy of body with its fields in Camel Case.
+    'data' values, leaf values and top-level fields already
+    in Camel Case are shared with body"""
     if isinstance(body, dict):
-        return {
-            snake_to_camel(key): (
-                _prepare_body(value) if key != 'data' else value)
+        body = {
+            snake_to_camel(key) if '_' in key else key: value
             for key, value in body.items()}
-    if isinstance(body, (list, tuple)):
-        return [_prepare_body(sub) for sub in body]
+        fields = [key for key in body if key != 'data']
+    elif isinstance(body, (list, tuple)):
+        body = list(body)
+        fields = range(len(body))
+    else:
+        return body
+    # a field coming from YAML is usually in Camel Case already: a scan
+    # is cheaper than a copy
+    stack = [
+        (body, field) for field in fields
+        if isinstance(body[field], (dict, list, tuple))
+        and not _is_camel_case(body[field])]
+    # the other fields are rebuilt once, in one iterative walk: each
+    # container is copied, then its children are rebuilt in the copy
+    while stack:
+        parent, index = stack.pop()
+        node = parent[index]
+        if isinstance(node, dict):
+            node = parent[index] = {
+                snake_to_camel(key) if '_' in key else key: value
+                for key, value in node.items()}
+            stack.extend(
+                (node, key) for key, value in node.items()
+                if key != 'data' and isinstance(value, (dict, list, tuple)))
+        else:
+            node = parent[index] = list(node)
+            stack.extend(
+                (node, index) for index, value in enumerate(node)
+                if isinstance(value, (dict, list, tuple)))
     return body
 
 
+def _pod_containers(name: str, namespace: str, cached: bool = True) -> tuple:
+    """Get the container names of a pod and its default container.
+    The result is kept for a few seconds so that successive
+    calls on the same pod read it only once"""
+    key = (namespace, name)
+    now = time.monotonic()
+    entry = _pod_cache.get(key)
+    if entry is not None:
+        if cached and now - entry[0] < _POD_CACHE_TTL:
+            _pod_cache.move_to_end(key)
+            return entry[1]
+        del _pod_cache[key]
+    resp = _api('CoreV1Api').read_namespaced_pod(
+        name=name, namespace=namespace, _preload_content=False)
+    # only a few fields are needed, skip the V1Pod deserialization
+    pod = _json_loads(resp.data)
+    containers = [ctn['name'] for ctn in pod['spec'].get('containers') or []]
+    containers += [ctn['name'] for ctn in pod['spec'].get('initContainers') or []]
+    annotations = pod['metadata'].get('annotations') or {}
+    result = (containers, annotations.get('kubectl.kubernetes.io/default-container'))
+    _pod_cache[key] = (now, result)
+    if len(_pod_cache) > _POD_CACHE_SIZE:
+        # drop the least recently used pod
+        _pod_cache.popitem(last=False)
+    return result
+
+
 def _find_container(name: str, namespace: str, container: str = None):
-    api = kubernetes.client.CoreV1Api()
-    containers = []
-    resp = api.read_namespaced_pod(name=name, namespace=namespace).to_dict()
-    if resp['spec']['containers']:
-        containers += [ctn['name'] for ctn in resp['spec']['containers']]
-    if resp['spec'].get('init_containers'):
-        containers += [ctn['name'] for ctn in resp['spec']['init_containers']]
+    containers, default = _pod_containers(name, namespace)
+    if container is not None and container not in containers:
+        # the pod may have been re-created with other containers since
+        containers, default = _pod_containers(name, namespace, cached=False)
     if container is None:
-        if 'annotations' in resp['metadata'] and \
-                resp['metadata']['annotations'] and \
-                'kubectl.kubernetes.io/default-container' in \
-                resp['metadata']['annotations']:
-            container = resp['metadata']['annotations'][
-                'kubectl.kubernetes.io/default-container']
-        else:
-            container = containers[0]
+        container = default or containers[0]
     if container not in containers:
         raise exceptions.KubectlInvalidContainerException(name, namespace, container)
     return container
 
 
+def _walk_files(path: str, arcname: str):
+    """Lazily yield (path, arcname) for every file below a directory.
+    Like os.walk, symlinks to directories are not followed and
+    unreadable directories are skipped"""
+    stack = [(path, arcname)]
+    while stack:
+        path, arcname = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not entry.is_dir():
+                        yield entry.path, os.path.join(arcname, entry.name)
+                    elif not entry.is_symlink():
+                        subdirs.append((entry.path, os.path.join(arcname, entry.name)))
+        except OSError:
+            continue
+        # depth-first, in directory order
+        stack.extend(reversed(subdirs))
+
+
 def get_contexts() -> dict:
     """List all the current contexts from ~/.kube/config or KUBECONFIG
     :returns: context dict"""
@@ -131,7 +232,7 @@ def connect(host: str = None, api_key: str = None,
     :returns: used context
     :raises exceptions.KubectlConfigException: if the connection fails"""
     # pylint: disable=global-statement
-    global _temp_files
+    global _temp_files, _last_discovery
     if not host:
         try:
             kubernetes.config.load_kube_config(context=context)
@@ -161,6 +262,11 @@ def connect(host: str = None, api_key: str = None,
         else:
             configuration.verify_ssl = False
         kubernetes.client.Configuration.set_default(configuration)
+    # allow discovery requests to run concurrently on their own connection
+    configuration = kubernetes.client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = max(
+        configuration.connection_pool_maxsize, _DISCOVERY_WORKERS)
+    kubernetes.client.Configuration.set_default(configuration)
     if not context:
         try:
             _, _active = kubernetes.config.kube_config.list_kube_config_contexts()
@@ -168,77 +274,204 @@ def connect(host: str = None, api_key: str = None,
             raise exceptions.KubectlConfigException(str(e)) from e
         if _active:
             context = _active['name']
+    _api_client.cache_clear()
+    _apis.clear()
+    _index_resources([])
+    _last_discovery = 0.0
     return context
 
 
+def _index_resources(resources: list):
+    """Store the discovered resources and index them by name, kind and short names"""
+    # pylint: disable=global-statement
+    global _resource_cache, _resource_by_name, _resource_by_kind, _resource_by_short
+    _resource_cache = resources
+    _resource_by_name = {}
+    _resource_by_kind = {}
+    _resource_by_short = {}
+    for res in resources:
+        _resource_by_name.setdefault(res['name'], res)
+        _resource_by_kind.setdefault(res['kind'].lower(), res)
+        for short_name in res.get('short_names') or ():
+            _resource_by_short.setdefault(short_name, res)
+
+
+def _load_discovery_cache(host: str) -> list:
+    """Get the resources persisted for a given server if they are still fresh"""
+    if not _discovery_cache_file:
+        return None
+    try:
+        with open(_discovery_cache_file, encoding='utf-8') as fd:
+            entry = _json_loads(fd.read())[host]
+        if time.time() - entry['timestamp'] > _DISCOVERY_CACHE_TTL:
+            return None
+        return entry['resources']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_discovery_cache(host: str, resources: list):
+    """Persist the resources of a given server so next processes skip discovery"""
+    if not _discovery_cache_file:
+        return
+    try:
+        with open(_discovery_cache_file, encoding='utf-8') as fd:
+            content = _json_loads(fd.read())
+    except (OSError, ValueError):
+        content = {}
+    content[host] = {'timestamp': time.time(), 'resources': resources}
+    try:
+        data = json.dumps(content)
+        directory = os.path.dirname(_discovery_cache_file)
+        os.makedirs(directory, exist_ok=True)
+        # write aside then rename so concurrent processes never read a partial file
+        with tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', dir=directory, delete=False) as fd:
+            fd.write(data)
+        os.replace(fd.name, _discovery_cache_file)
+    except (OSError, TypeError):
+        pass
+
+
+def _discover_resources() -> list:
+    """List every resource served by the server (similar to 'kubectl api-resources')"""
+    resources = []
+    api = _api('CoreV1Api')
+    for res in api.get_api_resources().to_dict()['resources']:
+        res['api'] = {
+            'name': 'CoreV1Api',
+            'version': 'v1',
+            'group_version': 'v1'}
+        resources += [res]
+    global_api = _api('ApisApi')
+    api = _api('CustomObjectsApi')
+    group_versions = [
+        (api_group['name'], version)
+        for api_group in global_api.get_api_versions().to_dict()['groups']
+        for version in api_group['versions']]
+    # one request per group version: run them concurrently but keep the order
+    with concurrent.futures.ThreadPoolExecutor(max_workers=_DISCOVERY_WORKERS) as pool:
+        responses = pool.map(
+            lambda gv: api.get_api_resources(gv[0], gv[1]['version']),
+            group_versions)
+        for (group, version), response in zip(group_versions, responses):
+            for res in response.to_dict()['resources']:
+                res['api'] = {
+                    'name': 'CustomObjectsApi',
+                    'group': group,
+                    'version': version['version'],
+                    'group_version': version['group_version']}
+                resources += [res]
+    return resources
+
+
+def _refresh_resources():
+    """Discover the resources again, then persist and index them"""
+    # pylint: disable=global-statement
+    global _last_discovery
+    _last_discovery = time.monotonic()
+    resources = _discover_resources()
+    _save_discovery_cache(
+        kubernetes.client.Configuration.get_default_copy().host, resources)
+    _index_resources(resources)
+
+
+def _find_resource(obj: str) -> dict:
+    """Look a resource up by name, kind or short name in the indexes"""
+    return _resource_by_name.get(obj) or \
+        _resource_by_kind.get(obj.lower()) or \
+        _resource_by_short.get(obj)
+
+
 def api_resources(obj: str = None) -> dict:
     """From a resource name or alias, extract the API name
     and version to use from api-resources"""
-    # pylint: disable=global-statement
-    global _resource_cache
     if not _resource_cache:
-        api = kubernetes.client.CoreV1Api()
-        for res in api.get_api_resources().to_dict()['resources']:
-            res['api'] = {
-                'name': 'CoreV1Api',
-                'version': 'v1',
-                'group_version': 'v1'}
-            _resource_cache += [res]
-        global_api = kubernetes.client.ApisApi()
-        api = kubernetes.client.CustomObjectsApi()
-        for api_group in global_api.get_api_versions().to_dict()['groups']:
-            for version in api_group['versions']:
-                for res in api.get_api_resources(
-                        api_group['name'],
-                        version['version']).to_dict()['resources']:
-                    res['api'] = {
-                        'name': 'CustomObjectsApi',
-                        'group': api_group['name'],
-                        'version': version['version'],
-                        'group_version': version['group_version']}
-                    _resource_cache += [res]
+        resources = _load_discovery_cache(
+            kubernetes.client.Configuration.get_default_copy().host)
+        if resources is None:
+            _refresh_resources()
+        else:
+            _index_resources(resources)
     if obj is not None:
-        for _cache in _resource_cache:
-            if _cache['name'] == obj or _cache['kind'].lower() == obj.lower() or \
-                    (_cache['short_names'] and obj in _cache['short_names']):
-                return _cache
-        raise exceptions.KubectlResourceTypeException(obj)
+        resource = _find_resource(obj)
+        if resource is None and \
+                time.monotonic() - _last_discovery > _DISCOVERY_RETRY_INTERVAL:
+            # the resource type may have been installed since the last discovery
+            _refresh_resources()
+            resource = _find_resource(obj)
+        if resource is None:
+            raise exceptions.KubectlResourceTypeException(obj)
+        return resource
     return _resource_cache
 
 
-def _api_call(api_resource: str, verb: str, resource: str, **opts) -> dict:
+def _api_error(err: Exception) -> str:
+    """Get the message of the server from an ApiException"""
+    try:
+        return _json_loads(err.body)['message']
+    except (ValueError, TypeError, KeyError):
+        # no Status body (a watch error event only has a reason)
+        return err.body or err.reason
+
+
+def _api_call(api_resource: str, verb: str, resource: str,
+              server_side_apply: bool = False, **opts) -> dict:
     """Execute calls directly to python-kubernetes"""
     ftn = f"{verb}_{resource}"
     name = None
     if verb == 'list' and 'name' in opts:
         name = opts['name']
         del opts['name']
-    api = getattr(kubernetes.client, api_resource)()
+        if name is not None:
+            # let the server do the filtering
+            opts['field_selector'] = f'metadata.name={name}'
+    api = _api(api_resource)
     try:
-        objs = getattr(api, ftn)(**opts)
+        if server_side_apply:
+            with _api_client().server_side_apply():
+                objs = getattr(api, ftn)(**opts)
+        else:
+            objs = getattr(api, ftn)(**opts)
     except kubernetes.client.rest.ApiException as err:
-        body = err.body
-        try:
-            body = json.loads(body)['message']
-        except (ValueError, AttributeError):
-            pass
-        raise exceptions.KubectlBaseException(body) from err
+        raise exceptions.KubectlBaseException(_api_error(err)) from err
+    # custom objects come back as plain dicts, check for them first
+    typed = not isinstance(objs, dict) and hasattr(objs, 'to_dict')
     # pylint: disable=no-else-return
     if verb == 'list':
-        if 'to_dict' in dir(objs):
-            objs = objs.to_dict()['items']
-        else:
-            objs = objs['items']
         if name is None:
-            return objs
-        for obj in objs:
-            if obj['metadata']['name'] == name:
-                return obj
-        return {}
+            return objs.to_dict()['items'] if typed else objs['items']
+        # some aggregated APIs ignore the field selector: check the names anyway
+        if typed:
+            return next((obj.to_dict() for obj in objs.items
+                         if obj.metadata.name == name), {})
+        return next((obj for obj in objs['items']
+                     if obj['metadata']['name'] == name), {})
     else:
-        if 'to_dict' in dir(objs):
-            return objs.to_dict()
-        return objs
+        return objs.to_dict() if typed else objs
+
+
+def _target(resource: dict, namespace: str, all_namespaces: bool = False) -> tuple:
+    """Get the python-kubernetes function suffix and options
+    addressing a resource in a namespace (or in all of them)"""
+    if resource['api']['name'] == 'CoreV1Api':
+        opts = {}
+        ftn = camel_to_snake(resource['kind'])
+        if resource['namespaced'] is True:
+            if all_namespaces is True:
+                ftn = f"{ftn}_for_all_namespaces"
+            else:
+                ftn = f"namespaced_{ftn}"
+                opts['namespace'] = namespace
+        return ftn, opts
+    opts = {
+        'plural': resource['name'],
+        'group': resource['api']['group'],
+        'version': resource['api']['version']}
+    if all_namespaces is False and resource['namespaced'] is True:
+        opts['namespace'] = namespace
+        return 'namespaced_custom_object', opts
+    return 'cluster_custom_object', opts
 
 
 def scale(obj: str, name: str, namespace: str = None,
@@ -282,24 +515,9 @@ def get(obj: str, name: str = None, namespace: str = None,
     if verb not in resource['verbs']:
         raise exceptions.KubectlMethodException
     namespace = namespace or 'default'
-    opts = {"label_selector": labels, "name": name}
-    if resource['api']['name'] == 'CoreV1Api':
-        ftn = camel_to_snake(resource['kind'])
-        if resource['namespaced'] is True:
-            if all_namespaces is True:
-                ftn = f"{ftn}_for_all_namespaces"
-            else:
-                ftn = f"namespaced_{ftn}"
-                opts['namespace'] = namespace
-    else:
-        opts['plural'] = resource['name']
-        opts['group'] = resource['api']['group']
-        opts['version'] = resource['api']['version']
-        if all_namespaces is False and resource['namespaced'] is True:
-            ftn = 'namespaced_custom_object'
-            opts['namespace'] = namespace
-        else:
-            ftn = 'cluster_custom_object'
+    ftn, opts = _target(resource, namespace, all_namespaces)
+    opts['label_selector'] = labels
+    opts['name'] = name
     return _api_call(resource['api']['name'], 'list', ftn, **opts)
 
 
@@ -315,46 +533,30 @@ def delete(obj: str, name: str, namespace: str = None, dry_run: bool = False) ->
     resource = api_resources(obj)
     if 'delete' not in resource['verbs']:
         raise exceptions.KubectlMethodException
-    opts = {"name": name}
-    if resource['api']['name'] == 'CoreV1Api':
-        ftn = camel_to_snake(resource['kind'])
-        if resource['namespaced'] is True:
-            ftn = f"namespaced_{ftn}"
-            opts['namespace'] = namespace
-    else:
-        opts['plural'] = resource['name']
-        opts['group'] = resource['api']['group']
-        opts['version'] = resource['api']['version']
-        if resource['namespaced'] is True:
-            ftn = 'namespaced_custom_object'
-            opts['namespace'] = namespace
-        else:
-            ftn = 'cluster_custom_object'
+    ftn, opts = _target(resource, namespace)
+    opts['name'] = name
     if dry_run:
         opts['dry_run'] = 'All'
+    elif resource['api']['name'] == 'CoreV1Api' and resource['kind'] == 'Pod':
+        _pod_cache.pop((namespace, name), None)
     return _api_call(resource['api']['name'], 'delete', ftn, **opts)
 
 
-def create(obj: str, name: str = None, namespace: str = None,
-           body: dict = None, dry_run: bool = False) -> dict:
-    """Create a resource (similar to 'kubectl create')
-    :param obj: resource type
-    :param name: resource name
-    :param namespace: namespace
-    :param body: kubernetes manifest body (overrides name and namespace)
-    :param dry_run: dry-run
-    :returns: data similar to 'kubectl create' in JSON format
-    :raises exceptions.KubectlMethodException: if the resource cannot be 'created'"""
-    body = body or {}
+def _manifest(obj: str, name: str, namespace: str, body: dict, verb: str) -> tuple:
+    """Check the verb is allowed and complete the manifest
+    with its name, namespace, apiVersion and kind"""
+    # fill in the converted copy: the caller's dict is left untouched
+    # and its 'data' is not copied a second time. Only metadata, which
+    # may be shared with the caller's dict, gets its own (shallow) copy
+    body = _prepare_body(body or {})
     namespace = namespace or 'default'
-    if 'metadata' not in body:
-        body['metadata'] = {}
+    body['metadata'] = dict(body.get('metadata') or {})
     if name is not None and 'name' not in body['metadata']:
         body['metadata']['name'] = name
     if 'name' not in body['metadata']:
         raise exceptions.KubectlResourceNameException
     resource = api_resources(obj)
-    if 'create' not in resource['verbs']:
+    if verb not in resource['verbs']:
         raise exceptions.KubectlMethodException
     if resource['namespaced'] is True and 'namespace' not in body['metadata']:
         body['metadata']['namespace'] = namespace
@@ -362,21 +564,22 @@ def create(obj: str, name: str = None, namespace: str = None,
         body['apiVersion'] = resource['api']['group_version']
     if 'kind' not in body:
         body['kind'] = resource['kind']
-    opts = {"body": _prepare_body(body)}
-    if resource['api']['name'] == 'CoreV1Api':
-        ftn = camel_to_snake(resource['kind'])
-        if resource['namespaced'] is True:
-            ftn = f"namespaced_{ftn}"
-            opts['namespace'] = body['metadata']['namespace']
-    else:
-        opts['plural'] = resource['name']
-        opts['group'] = resource['api']['group']
-        opts['version'] = resource['api']['version']
-        if resource['namespaced'] is True:
-            ftn = 'namespaced_custom_object'
-            opts['namespace'] = body['metadata']['namespace']
-        else:
-            ftn = 'cluster_custom_object'
+    return resource, body
+
+
+def create(obj: str, name: str = None, namespace: str = None,
+           body: dict = None, dry_run: bool = False) -> dict:
+    """Create a resource (similar to 'kubectl create')
+    :param obj: resource type
+    :param name: resource name
+    :param namespace: namespace
+    :param body: kubernetes manifest body (overrides name and namespace)
+    :param dry_run: dry-run
+    :returns: data similar to 'kubectl create' in JSON format
+    :raises exceptions.KubectlMethodException: if the resource cannot be 'created'"""
+    resource, body = _manifest(obj, name, namespace, body, 'create')
+    ftn, opts = _target(resource, body['metadata'].get('namespace'))
+    opts['body'] = body
     if dry_run:
         opts['dry_run'] = 'All'
     return _api_call(resource['api']['name'], 'create', ftn, **opts)
@@ -392,41 +595,29 @@ def patch(obj: str, name: str = None, namespace: str = None,
     :param dry_run: dry-run
     :returns: data similar to 'kubectl patch' in JSON format
     :raises exceptions.KubectlMethodException: if the resource cannot be 'patched'"""
-    body = body or {}
-    namespace = namespace or 'default'
-    if 'metadata' not in body:
-        body['metadata'] = {}
-    if name is not None and 'name' not in body['metadata']:
-        body['metadata']['name'] = name
-    if 'name' not in body['metadata']:
-        raise exceptions.KubectlResourceNameException
-    resource = api_resources(obj)
-    if 'patch' not in resource['verbs']:
-        raise exceptions.KubectlMethodException
-    if resource['namespaced'] is True and 'namespace' not in body['metadata']:
-        body['metadata']['namespace'] = namespace
-    if 'apiVersion' not in body:
-        body['apiVersion'] = resource['api']['group_version']
-    if 'kind' not in body:
-        body['kind'] = resource['kind']
-    opts = {"name": body['metadata']['name'], "body": _prepare_body(body)}
-    if resource['api']['name'] == 'CoreV1Api':
-        ftn = camel_to_snake(resource['kind'])
-        if resource['namespaced'] is True:
-            ftn = f"namespaced_{ftn}"
-            opts['namespace'] = body['metadata']['namespace']
-    else:
-        opts['plural'] = resource['name']
-        opts['group'] = resource['api']['group']
-        opts['version'] = resource['api']['version']
-        if resource['namespaced'] is True:
-            ftn = 'namespaced_custom_object'
-            opts['namespace'] = body['metadata']['namespace']
-        else:
-            ftn = 'cluster_custom_object'
+    return _patch(obj, name, namespace, body, dry_run)
+
+
+def _patch(obj: str, name: str = None, namespace: str = None, body: dict = None,
+           dry_run: bool = False, server_side_apply: bool = False,
+           force: bool = False) -> dict:
+    """Patch a resource, optionally as a server-side apply"""
+    resource, body = _manifest(obj, name, namespace, body, 'patch')
+    ftn, opts = _target(resource, body['metadata'].get('namespace'))
+    opts['name'] = body['metadata']['name']
+    opts['body'] = body
     if dry_run:
         opts['dry_run'] = 'All'
-    return _api_call(resource['api']['name'], 'patch', ftn, **opts)
+    if server_side_apply:
+        # a body read back with get() carries fields the server refuses
+        # in an apply (metadata is a copy, see _manifest())
+        body['metadata'].pop('managedFields', None)
+        body['metadata'].pop('resourceVersion', None)
+        opts['field_manager'] = 'kubectl-helper'
+        if force:
+            opts['force'] = True
+    return _api_call(resource['api']['name'], 'patch', ftn,
+                     server_side_apply=server_side_apply, **opts)
 
 
 def run(name: str, image: str, namespace: str = None, annotations: dict = None,
@@ -478,24 +669,57 @@ def annotate(obj: str, name: str, namespace: str = None,
     :returns: data similar to 'kubectl annotate' in JSON format
     :raises exceptions.KubectlBaseException: if an annotation exists and overwrite=False
     :raises exceptions.KubectlBaseException: no annotation are submitted"""
-    body = get(obj, name, namespace)
-    current = body['metadata'].get('annotations', {}) or {}
+    if not annotations:
+        raise exceptions.KubectlBaseException(
+            "error: at least one annotation update is required")
     if overwrite is False:
+        body = get(obj, name, namespace)
+        current = body['metadata'].get('annotations', {}) or {}
         for key in current:
             if key in annotations and annotations[key] is not None:
                 raise exceptions.KubectlBaseException(
                     "error: overwrite is false but found the "
                     "following declared annotation(s): "
                     f"'{key}' already has a value ({current[key]})")
-    if not annotations:
-        raise exceptions.KubectlBaseException(
-            "error: at least one annotation update is required")
-    current.update(annotations)
+    # the server merges the annotations with the existing ones
     return patch(obj, name, namespace,
-                 {'metadata': {'annotations': current}},
+                 {'metadata': {'annotations': dict(annotations)}},
                  dry_run=dry_run)
 
 
+def _object_states(obj: str, name: str, namespace: str, timeout: float):
+    """Yield the successive states of a resource for timeout seconds.
+    Changes are watched when the resource supports it, otherwise
+    it is polled with an exponential backoff"""
+    resource = api_resources(obj)
+    deadline = time.monotonic() + timeout
+    if 'watch' not in resource['verbs']:
+        delay = _WAIT_POLL_DELAY
+        while time.monotonic() + delay < deadline:
+            time.sleep(delay)
+            delay = min(delay * 2, _WAIT_POLL_MAX_DELAY)
+            yield get(obj, name, namespace)
+        return
+    ftn, opts = _target(resource, namespace)
+    opts['field_selector'] = f'metadata.name={name}'
+    func = getattr(_api(resource['api']['name']), f"list_{ftn}")
+    while time.monotonic() < deadline:
+        opts['timeout_seconds'] = max(1, int(deadline - time.monotonic()))
+        try:
+            for event in kubernetes.watch.Watch().stream(func, **opts):
+                if event['type'] in ('ADDED', 'MODIFIED'):
+                    res = event['object']
+                    yield res if isinstance(res, dict) else res.to_dict()
+                elif event['type'] == 'DELETED':
+                    # the resource is gone: report it as get() would
+                    yield {}
+                    return
+        except kubernetes.client.rest.ApiException as err:
+            # the watch expired: start a new one
+            if err.status != 410:
+                raise exceptions.KubectlBaseException(_api_error(err)) from err
+
+
 def wait(obj: str, name: str, namespace: str = None,
          condition: str = None, timeout: int = 300) -> bool:
     """Wait for a pod to be at a given state
@@ -512,9 +736,10 @@ def wait(obj: str, name: str, namespace: str = None,
         raise exceptions.KubectlBaseException(
             "condition format must be condition=status")
     _res = get(obj, name, namespace)
-    _start = time.time()
+    _start = time.monotonic()
+    _states = None
     while True:
-        if time.time() - _start > timeout:
+        if _res is None or time.monotonic() - _start > timeout:
             raise exceptions.KubectlBaseException(
                 f'error: unrecognized condition: "{condition}"')
         for _sub in condition.split('=')[0].split('.'):
@@ -529,8 +754,10 @@ def wait(obj: str, name: str, namespace: str = None,
                 " or list which is not supported")
         if str(_res).lower() == condition.split('=')[1].lower():
             break
-        time.sleep(5)
-        _res = get(obj, name, namespace)
+        if _states is None:
+            _states = _object_states(
+                obj, name, namespace, timeout - (time.monotonic() - _start))
+        _res = next(_states, None)
     return True
 
 
@@ -545,35 +772,53 @@ def logs(name: str, namespace: str = None, container: str = None,
     :raises exceptions.KubectlInvalidContainerException: if the container doesnt exist
     :raises exceptions.KubectlBaseException: if the pod is not ready"""
     namespace = namespace or 'default'
-    api = kubernetes.client.CoreV1Api()
-    container = _find_container(name, namespace, container)
-    try:
+    api = _api('CoreV1Api')
+
+    def read_log(container):
         return api.read_namespaced_pod_log(
             name,
             namespace,
             container=container,
             follow=follow,
             _preload_content=False)
+
+    if container is None:
+        # the default container is only known from the pod itself
+        container = _find_container(name, namespace)
+        future = None
+    else:
+        # check the container while the log request is in flight
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(read_log, container)
+            checked = False
+            try:
+                _find_container(name, namespace, container)
+                checked = True
+            finally:
+                # whatever the failure, release the pooled connection
+                # of a response that will never be returned
+                if not checked and future.exception() is None:
+                    future.result().close()
+    try:
+        return future.result() if future else read_log(container)
     except kubernetes.client.exceptions.ApiException as err:
-        body = err.body
-        try:
-            body = json.loads(body)['message']
-        except (ValueError, AttributeError):
-            pass
-        raise exceptions.KubectlBaseException(body) from err
+        raise exceptions.KubectlBaseException(_api_error(err)) from err
 
 
-def apply(body: dict, dry_run: bool = False) -> dict:
-    """Create/Update a resource (similar to 'kubectl apply')
+def apply(body: dict, dry_run: bool = False, force: bool = False) -> dict:
+    """Create/Update a resource (similar to 'kubectl apply --server-side')
+    Fields owned by another field manager are not changed,
+    the server reports a conflict instead, unless force is set
     :param body: kubenetes manifest data in JSON format
     :param dry_run: dry-run
+    :param force: take over the ownership of conflicting fields
     :returns: data similar to 'kubectl apply' in JSON format"""
     name = body['metadata']['name']
     namespace = body['metadata'].get('namespace', None)
     obj = body['kind']
-    if get(obj, name, namespace) == {}:
-        return create(obj, name, namespace, body, dry_run=dry_run)
-    return patch(obj, name, namespace, body, dry_run=dry_run)
+    # the server creates or updates the resource in a single request
+    return _patch(obj, name, namespace, body, dry_run=dry_run,
+                  server_side_apply=True, force=force)
 
 
 def top(obj: str, namespace: str = None, all_namespaces: bool = False) -> dict:
@@ -583,10 +828,9 @@ def top(obj: str, namespace: str = None, all_namespaces: bool = False) -> dict:
     :param all_namespaces: scope where the resource must be gotten from
     :returns: data similar to 'kubectl top' in JSON format
     :raises exceptions.KubectlBaseException: if the resource is neither pod nor nodes"""
-    if obj not in ('pod', 'pods', 'node', 'nodes'):
+    if obj not in _TOP_METRICS:
         raise exceptions.KubectlBaseException(f'error: unknown command "{obj}"')
-    obj = 'podmetrics' if obj in ('pod', 'pods') else 'nodemetrics'
-    return get(obj, namespace=namespace, all_namespaces=all_namespaces)
+    return get(_TOP_METRICS[obj], namespace=namespace, all_namespaces=all_namespaces)
 
 
 # pylint: disable=redefined-builtin
@@ -603,7 +847,7 @@ def exec(name: str, command: list, namespace: str = None,
     :returns: list of command execution exit code and return value
     :raises exceptions.KubectlInvalidContainerException: if the container doesnt exist"""
     namespace = namespace or 'default'
-    api = kubernetes.client.CoreV1Api()
+    api = _api('CoreV1Api')
     container = _find_container(name, namespace, container)
     resp = kubernetes.stream.stream(
         api.connect_get_namespaced_pod_exec,
@@ -615,13 +859,15 @@ def exec(name: str, command: list, namespace: str = None,
         stdout=True, tty=False,
         _preload_content=False)
     while resp.is_open():
-        resp.update(timeout=1)
+        # sleep until the next frame (TLS-buffered ones included)
+        # rather than waking every second
+        wsclient.update(resp, None)
         if resp.peek_stdout() and stdout is True:
             sys.stdout.write(resp.read_stdout())
         if resp.peek_stderr() and stderr is True:
             sys.stderr.write(resp.read_stderr())
     err = resp.read_channel(kubernetes.stream.ws_client.ERROR_CHANNEL)
-    return json.loads(err)["status"] == "Success", ''.join(resp.read_all())
+    return _json_loads(err)["status"] == "Success", ''.join(resp.read_all())
 
 
 # pylint: disable=too-many-branches
@@ -643,7 +889,7 @@ def cp(source: str, destination: str,
         raise exceptions.KubectlBaseException(
             'error: one of src or dest must be a remote file specification')
     namespace = namespace or 'default'
-    api = kubernetes.client.CoreV1Api()
+    api = _api('CoreV1Api')
     if len(destination.split(':')) > 1:
         pod_name, remote_path = destination.split(':', 1)
         if remote_path.endswith('/'):
@@ -666,40 +912,28 @@ def cp(source: str, destination: str,
             stdout=True, tty=False,
             _preload_content=False)
 
-        _files = []
         if os.path.isdir(source):
-            for _dir, _, _file_list in os.walk(source):
-                _files += [
-                    (os.path.join(_dir, _file), os.path.join(
-                        _dest_path, _dir.replace(source, '.', 1), _file))
-                    for _file in _file_list]
+            _files = _walk_files(source, os.path.join(_dest_path, '.'))
         else:
             _files = [(source, _dest_path)]
-        with tempfile.TemporaryFile() as tar_buffer:
-            with tarfile.open(fileobj=tar_buffer, mode='w') as tar:
-                for _file in _files:
-                    tar.add(_file[0], _file[1])
-
-            tar_buffer.seek(0)
-            commands = []
-            commands.append(tar_buffer.read())
-
-            while resp.is_open():
-                resp.update(timeout=1)
-                if resp.peek_stdout():
-                    print(f"STDOUT: {resp.read_stdout()}")
-                if resp.peek_stderr():
-                    print(f"STDERR: {resp.read_stderr()}")
-                if commands:
-                    c = commands.pop(0)
-                    try:
-                        c = c.decode()
-                    except UnicodeDecodeError:
-                        pass
-                    resp.write_stdin(c)
-                else:
-                    break
-            resp.close()
+        # the archive is streamed to the pod while it is built
+        with tarfile.open(fileobj=wsclient.Writer(resp), mode='w|',
+                          bufsize=_CP_CHUNK_SIZE) as tar:
+            for _file in _files:
+                tar.add(_file[0], _file[1], recursive=False)
+
+        # the remote tar exits at the end of the archive: wait for its
+        # status on the error channel (or the close) to report its output
+        deadline = time.monotonic() + _CP_CLOSE_TIMEOUT
+        while resp.is_open():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not wsclient.readable(resp, remaining):
+                break
+            wsclient.update(resp)
+            wsclient.print_output(resp)
+            if resp.peek_channel(kubernetes.stream.ws_client.ERROR_CHANNEL):
+                break
+        resp.close()
     else:
         pod_name, remote_path = source.split(':', 1)
         container = _find_container(pod_name, namespace, container)
@@ -716,25 +950,16 @@ def cp(source: str, destination: str,
             stderr=True, stdin=False,
             stdout=True, tty=False,
             _preload_content=False)
-        with tempfile.TemporaryFile() as tar_buffer:
-            while True:
-                # workaround to handle big binary files
-                out, err, closed = _read_bytes_from_wsclient(resp)
-                if out:
-                    tar_buffer.write(out)
-                if err:
-                    print(f"STDERR: {err.decode()}")
-                if closed:
-                    break
-            resp.close()
-            tar_buffer.flush()
-            tar_buffer.seek(0)
-            if remote_path.startswith('/'):
-                remote_path = remote_path[1:]
-            with tarfile.open(fileobj=tar_buffer, mode='r:') as tar:
-                if not tar.getmembers():
-                    return False
-                for member in tar.getmembers():
+        if remote_path.startswith('/'):
+            remote_path = remote_path[1:]
+        extracted = False
+        reader = wsclient.Reader(resp)
+        try:
+            # members are extracted while the archive is received
+            with tarfile.open(fileobj=reader, mode='r|', bufsize=_CP_CHUNK_SIZE,
+                              copybufsize=_CP_CHUNK_SIZE) as tar:
+                for member in tar:
+                    extracted = True
                     if os.path.isdir(destination):
                         local_file = os.path.join(
                             destination, member.name.replace(remote_path, '.', 1))
@@ -746,6 +971,17 @@ def cp(source: str, destination: str,
                         local_file = destination
 
                     tar.makefile(member, local_file)
+            # the remote tar exits once the archive is sent: read up to
+            # the close so that its status is received
+            reader.read()
+        finally:
+            resp.close()
+            # a failed extraction is usually explained by the remote tar
+            if reader.stderr:
+                print(f"STDERR: {reader.stderr.decode(errors='replace')}")
+        status = resp.read_channel(kubernetes.stream.ws_client.ERROR_CHANNEL)
+        if not extracted or (status and _json_loads(status)['status'] != 'Success'):
+            return False
     return True
 
 
@@ -0,0 +1,54 @@
+"""ApiClient shared by the kubectl helpers"""
+
+import contextlib
+import json
+import threading
+import kubernetes.client  # pylint: disable=import-error
+try:
+    import orjson  # pylint: disable=import-error
+    json_loads = orjson.loads  # pylint: disable=no-member
+except ImportError:
+    json_loads = json.loads
+
+
+class ApiClient(kubernetes.client.ApiClient):
+    """ApiClient asking for compressed responses and parsing them
+    with orjson when it is available"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._server_side_apply = threading.local()
+
+    @contextlib.contextmanager
+    def server_side_apply(self):
+        """Send the PATCH requests of the current thread as server-side apply"""
+        self._server_side_apply.enabled = True
+        try:
+            yield self
+        finally:
+            self._server_side_apply.enabled = False
+
+    def select_header_content_type(self, content_types):
+        if getattr(self._server_side_apply, 'enabled', False):
+            return 'application/apply-patch+yaml'
+        return super().select_header_content_type(content_types)
+
+    def request(self, method, url, query_params=None, headers=None,
+                post_params=None, body=None, _preload_content=True,
+                _request_timeout=None):
+        if method == 'GET' and _preload_content:
+            # urllib3 inflates the body transparently
+            headers = dict(headers or {}, **{'Accept-Encoding': 'gzip'})
+        return super().request(
+            method, url, query_params, headers, post_params, body,
+            _preload_content, _request_timeout)
+
+    def deserialize(self, response, response_type):
+        if response_type == "file" or json_loads is json.loads:
+            return super().deserialize(response, response_type)
+        try:
+            data = json_loads(response.data)
+        except ValueError:
+            data = response.data
+        # pylint: disable=no-member
+        return self._ApiClient__deserialize(data, response_type)
@@ -0,0 +1,142 @@
+"""Helpers reading and writing kubernetes exec websockets"""
+
+import selectors
+import ssl
+import weakref
+import kubernetes.stream  # pylint: disable=import-error
+
+_selectors = weakref.WeakKeyDictionary()
+
+
+def readable(
+        ws_client: kubernetes.stream.ws_client.WSClient,
+        timeout: float = 0) -> bool:
+    """Wait (at most timeout seconds) until a frame can be read from the websocket"""
+    sock = ws_client.sock.sock
+    # TLS may hold decrypted bytes the kernel does not report as readable
+    if isinstance(sock, ssl.SSLSocket) and sock.pending():
+        return True
+    selector = _selectors.get(ws_client)
+    if selector is None:
+        selector = _selectors[ws_client] = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+    return bool(selector.select(timeout))
+
+
+def _receive(
+        ws_client: kubernetes.stream.ws_client.WSClient,
+        timeout: float = 0) -> (int, bytes):
+    """Receive one frame (waiting at most timeout seconds)
+    and return its channel and data"""
+    if not ws_client.sock.connected:
+        # pylint: disable=protected-access
+        ws_client._connected = False
+    if not ws_client.is_open() or not readable(ws_client, timeout):
+        return None, None
+    # recv_data_frame() goes through the SSL object, so TLS-pending
+    # frames are read even though the socket itself is not readable
+    op_code, frame = ws_client.sock.recv_data_frame(True)
+    if op_code == 0x8:
+        # pylint: disable=protected-access
+        ws_client._connected = False
+    elif op_code in (0x1, 0x2) and len(frame.data) > 1:
+        return frame.data[0], frame.data[1:]
+    return None, None
+
+
+def _store(
+        ws_client: kubernetes.stream.ws_client.WSClient,
+        channel: int, data: bytes):
+    """Append data to a channel buffer of the client, as WSClient.update() does"""
+    if not ws_client.binary:
+        data = data.decode("utf-8", "replace")
+    # pylint: disable=protected-access
+    if channel in (kubernetes.stream.ws_client.STDOUT_CHANNEL,
+                   kubernetes.stream.ws_client.STDERR_CHANNEL):
+        ws_client._all.write(data)
+    if channel in ws_client._channels:
+        ws_client._channels[channel] += data
+    else:
+        ws_client._channels[channel] = data
+
+
+def update(
+        ws_client: kubernetes.stream.ws_client.WSClient,
+        timeout: float = 0):
+    """Same as WSClient.update(), with frames held in the TLS buffer
+    read as well (timeout=None waits for the next frame)"""
+    channel, data = _receive(ws_client, timeout)
+    if data:
+        _store(ws_client, channel, data)
+
+
+def read_bytes(
+        ws_client: kubernetes.stream.ws_client.WSClient,
+        timeout: int = 0) -> (bytes, bytes, bool):
+    """Receive one frame and return its stdout and stderr bytes
+    and whether the websocket is closed.
+    Other channels (the command status) are kept in the client buffers"""
+    if not ws_client.sock.connected:
+        # pylint: disable=protected-access
+        ws_client._connected = False
+    if not ws_client.is_open():
+        return None, None, True
+    stdout_bytes = None
+    stderr_bytes = None
+    channel, data = _receive(ws_client, timeout)
+    if data:
+        if channel == kubernetes.stream.ws_client.STDOUT_CHANNEL:
+            stdout_bytes = data
+        elif channel == kubernetes.stream.ws_client.STDERR_CHANNEL:
+            stderr_bytes = data
+        else:
+            _store(ws_client, channel, data)
+    return stdout_bytes, stderr_bytes, not ws_client.is_open()
+
+
+def print_output(ws_client: kubernetes.stream.ws_client.WSClient):
+    """Print what the remote command wrote so far"""
+    if ws_client.peek_stdout():
+        print(f"STDOUT: {ws_client.read_stdout()}")
+    if ws_client.peek_stderr():
+        print(f"STDERR: {ws_client.read_stderr()}")
+
+
+class Writer:  # pylint: disable=too-few-public-methods
+    """Write-only file-like object sending data to an exec websocket stdin"""
+
+    def __init__(self, ws_client: kubernetes.stream.ws_client.WSClient):
+        self.ws_client = ws_client
+
+    def write(self, data: bytes) -> int:
+        """Send data as a binary frame and pump incoming frames"""
+        self.ws_client.write_stdin(bytes(data))
+        update(self.ws_client)
+        print_output(self.ws_client)
+        return len(data)
+
+
+class Reader:  # pylint: disable=too-few-public-methods
+    """Read-only file-like object receiving data from an exec websocket stdout"""
+
+    def __init__(self, ws_client: kubernetes.stream.ws_client.WSClient):
+        self.ws_client = ws_client
+        self.buffer = bytearray()
+        self.stderr = bytearray()
+        self.eof = False
+
+    def read(self, size: int = -1) -> bytes:
+        """Read size bytes (or everything up to the end of the stream)"""
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            out, err, self.eof = read_bytes(self.ws_client, timeout=1)
+            if out:
+                self.buffer += out
+            if err:
+                self.stderr += err
+        if size < 0:
+            size = len(self.buffer)
+        # copy the chunk once, dropping the head of a bytearray is cheap
+        with memoryview(self.buffer) as view:
+            data = bytes(view[:size])
+        del self.buffer[:size]
+        return data
@@ -1,5 +1,7 @@
 import os
 import sys
+import json
+import time
 from unittest import mock
 import unittest
 import tarfile
@@ -15,7 +17,57 @@ class InitTests(unittest.TestCase):
 
     def setUp(self):
         kubernetes.client.Configuration._default = None
-        kubectl._resource_cache = []
+        kubectl._index_resources([])
+        kubectl._last_discovery = 0.0
+        kubectl._discovery_cache_file = None
+        kubectl._api_client.cache_clear()
+        kubectl._apis.clear()
+        kubectl._pod_cache.clear()
+
+    def test_case_converters(self):
+        self.assertEqual(kubectl.camel_to_snake('StatefulSet'), 'stateful_set')
+        self.assertEqual(kubectl.camel_to_snake('imagePullPolicy'), 'image_pull_policy')
+        self.assertEqual(kubectl.camel_to_snake('HTTPGetAction'), 'http_get_action')
+        self.assertEqual(kubectl.camel_to_snake('v1Beta1'), 'v1_beta1')
+        self.assertEqual(kubectl.snake_to_camel('image_pull_policy'), 'imagePullPolicy')
+        self.assertEqual(kubectl.snake_to_camel('spec'), 'spec')
+
+    def test_api_client_deserialize(self):
+        response = mock.Mock(data='{"metadata": {"name": "toto"}}')
+        pod = kubectl._api_client().deserialize(response, 'V1Pod')
+        self.assertEqual(pod.metadata.name, 'toto')
+        response = mock.Mock(data='no_json')
+        self.assertEqual(kubectl._api_client().deserialize(response, 'str'), 'no_json')
+
+    def test_api_client_gzip(self):
+        client = kubectl._api_client()
+        with mock.patch.object(client.rest_client, 'GET') as m:
+            client.request('GET', 'http://localhost', headers={'Accept': 'application/json'})
+            self.assertEqual(m.call_args.kwargs['headers'], {'Accept': 'application/json', 'Accept-Encoding': 'gzip'})
+            client.request('GET', 'http://localhost', headers={}, _preload_content=False)
+            self.assertEqual(m.call_args.kwargs['headers'], {})
+
+    def test_prepare_body(self):
+        body = {
+            'api_version': 'v1',
+            'spec': {'containers': [{'image_pull_policy': 'Always', 'env': ({'value_from': {}},)}]},
+            'data': {'not_converted': 'value'}}
+        result = kubectl._prepare_body(body)
+        self.assertEqual(result, {
+            'apiVersion': 'v1',
+            'spec': {'containers': [{'imagePullPolicy': 'Always', 'env': [{'valueFrom': {}}]}]},
+            'data': {'not_converted': 'value'}})
+        self.assertEqual(list(result), ['apiVersion', 'spec', 'data'])
+        self.assertIs(result['data'], body['data'])
+        camel = {'metadata': {'name': 'toto'}, 'spec': {'containers': [{'imagePullPolicy': 'Always'}]}}
+        result = kubectl._prepare_body(camel)
+        self.assertIsNot(result, camel)
+        self.assertIs(result['spec'], camel['spec'])
+        self.assertEqual(kubectl._prepare_body('value'), 'value')
+        self.assertEqual(body, {
+            'api_version': 'v1',
+            'spec': {'containers': [{'image_pull_policy': 'Always', 'env': ({'value_from': {}},)}]},
+            'data': {'not_converted': 'value'}})
 
     def test_cleanup_files(self):
         m = mock.Mock() 
@@ -40,6 +92,17 @@ class InitTests(unittest.TestCase):
             with self.assertRaises(kubectl.exceptions.KubectlConfigException):
                 kubectl.connect()
 
+    def test_config_with_exception_out_of_cluster(self):
+        m = mock.Mock()
+        m.side_effect = kubernetes.config.config_exception.ConfigException("ERROR")
+        m2 = mock.Mock()
+        m2.side_effect = kubernetes.config.config_exception.ConfigException("NOT IN CLUSTER")
+        with mock.patch("kubernetes.config.load_kube_config", m):
+            with mock.patch("kubernetes.config.load_incluster_config", m2):
+                with self.assertRaisesRegex(kubectl.exceptions.KubectlConfigException, "ERROR"):
+                    kubectl.connect()
+        m2.assert_called_once_with()
+
     def test_config_with_exception_and_context(self):
         m = mock.Mock()
         m.side_effect = kubernetes.config.config_exception.ConfigException("ERROR")
@@ -67,14 +130,41 @@ class InitTests(unittest.TestCase):
             {'authorization': 'Bearer APIKEY'})
         self.assertFalse(kubernetes.client.Configuration._default.verify_ssl)
         self.assertIsNone(kubernetes.client.Configuration._default.ssl_ca_cert)
+        self.assertGreaterEqual(kubernetes.client.Configuration._default.connection_pool_maxsize, 16)
 
     def test_unknown_resource(self):
         m = mock.Mock()
-        m.CoreV1Api.return_value.get_api_resources.return_value.to_dict.return_value = {'resources': []}
+        m.CoreV1Api.return_value.get_api_resources.return_value.to_dict.return_value = {
+            'resources': [{
+                'kind': 'Pod', 'name': 'pods',
+                'namespaced': True, 'short_names': ['po'],
+                'verbs': ['get', 'list']}]
+        }
         m.ApisApi.return_value.get_api_versions.return_value.to_dict.return_value = {'groups': []}
         with mock.patch("kubernetes.client", m):
             with self.assertRaises(kubectl.exceptions.KubectlResourceTypeException):
                 kubectl.api_resources("imtf")
+            with self.assertRaises(kubectl.exceptions.KubectlResourceTypeException):
+                kubectl.api_resources("imtf")
+            self.assertEqual(kubectl.api_resources("po")['name'], 'pods')
+        m.CoreV1Api.return_value.get_api_resources.assert_called_once_with()
+
+    def test_unknown_resource_rediscovery(self):
+        m = mock.Mock()
+        m.CoreV1Api.return_value.get_api_resources.return_value.to_dict.return_value = {
+            'resources': [{
+                'kind': 'Pod', 'name': 'pods',
+                'namespaced': True, 'short_names': ['po'],
+                'verbs': ['get', 'list']}]
+        }
+        m.ApisApi.return_value.get_api_versions.return_value.to_dict.return_value = {'groups': []}
+        with mock.patch("kubernetes.client", m):
+            with self.assertRaises(kubectl.exceptions.KubectlResourceTypeException):
+                kubectl.api_resources("imtf")
+            kubectl._last_discovery -= kubectl._DISCOVERY_RETRY_INTERVAL + 1
+            with self.assertRaises(kubectl.exceptions.KubectlResourceTypeException):
+                kubectl.api_resources("imtf")
+        self.assertEqual(m.CoreV1Api.return_value.get_api_resources.call_count, 2)
 
     def test_get_api_resources(self):
         m = mock.Mock()
@@ -105,6 +195,69 @@ class InitTests(unittest.TestCase):
             self.assertEqual(kubectl.api_resources(), results)
             self.assertEqual(kubectl._resource_cache, results)
 
+    def test_get_api_resources_from_disk_cache(self):
+        m = mock.Mock()
+        m.Configuration.get_default_copy.return_value.host = 'https://k8s'
+        m.CoreV1Api.return_value.get_api_resources.return_value.to_dict.return_value = {
+            'resources': [{
+                'kind': 'Pod', 'name': 'pods',
+                'namespaced': True, 'short_names': ['po'],
+                'verbs': ['get', 'list']}]
+        }
+        m.ApisApi.return_value.get_api_versions.return_value.to_dict.return_value = {'groups': []}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            kubectl._discovery_cache_file = os.path.join(tmpdir, 'cache', 'discovery.json')
+            with mock.patch("kubernetes.client", m):
+                self.assertEqual(kubectl.api_resources('po')['kind'], 'Pod')
+                kubectl._index_resources([])
+                self.assertEqual(kubectl.api_resources('pod')['name'], 'pods')
+            m.CoreV1Api.return_value.get_api_resources.assert_called_once_with()
+
+    def test_get_api_resources_expired_disk_cache(self):
+        m = mock.Mock()
+        m.Configuration.get_default_copy.return_value.host = 'https://k8s'
+        m.CoreV1Api.return_value.get_api_resources.return_value.to_dict.return_value = {
+            'resources': [{
+                'kind': 'Pod', 'name': 'pods',
+                'namespaced': True, 'short_names': ['po'],
+                'verbs': ['get', 'list']}]
+        }
+        m.ApisApi.return_value.get_api_versions.return_value.to_dict.return_value = {'groups': []}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            kubectl._discovery_cache_file = os.path.join(tmpdir, 'discovery.json')
+            with open(kubectl._discovery_cache_file, 'w') as fd:
+                json.dump({'https://k8s': {'timestamp': 0, 'resources': []}}, fd)
+            with mock.patch("kubernetes.client", m):
+                self.assertEqual(kubectl.api_resources('po')['kind'], 'Pod')
+            with open(kubectl._discovery_cache_file) as fd:
+                self.assertEqual(json.load(fd)['https://k8s']['resources'][0]['name'], 'pods')
+            self.assertEqual(os.listdir(tmpdir), ['discovery.json'])
+
+    def test_get_api_resources_refreshed_on_miss(self):
+        m = mock.Mock()
+        m.Configuration.get_default_copy.return_value.host = 'https://k8s'
+        m.CoreV1Api.return_value.get_api_resources.return_value.to_dict.return_value = {'resources': []}
+        m.ApisApi.return_value.get_api_versions.return_value.to_dict.return_value = {'groups': [{
+            'name': 'imtf.k8s.io',
+            'versions': [{'version': 'v1', 'group_version': 'imtf.k8s.io/v1'}]
+        }]}
+        m.CustomObjectsApi.return_value.get_api_resources.return_value.to_dict.return_value = {
+            'resources': [{
+                'kind': 'ImtfInstance', 'name': 'imtfinstances',
+                'namespaced': False, 'short_names': ['imtf'],
+                'verbs': ['get', 'list']}]
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            kubectl._discovery_cache_file = os.path.join(tmpdir, 'discovery.json')
+            with open(kubectl._discovery_cache_file, 'w') as fd:
+                json.dump({'https://k8s': {'timestamp': time.time(), 'resources': []}}, fd)
+            with mock.patch("kubernetes.client", m):
+                self.assertEqual(kubectl.api_resources('imtf')['kind'], 'ImtfInstance')
+                self.assertEqual(kubectl.api_resources('imtfinstances')['kind'], 'ImtfInstance')
+            with open(kubectl._discovery_cache_file) as fd:
+                self.assertEqual(json.load(fd)['https://k8s']['resources'][0]['name'], 'imtfinstances')
+        m.CoreV1Api.return_value.get_api_resources.assert_called_once_with()
+
     def test_api_call_exception_1(self):
         m = mock.Mock()
         exc = kubernetes.client.rest.ApiException()
@@ -127,14 +280,14 @@ class InitTests(unittest.TestCase):
 
     def test_list_namespace(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, "kind": "Namespace", "name": "namespaces", "namespaced": False, "short_names": ["ns"], "verbs": ["get", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, "kind": "Namespace", "name": "namespaces", "namespaced": False, "short_names": ["ns"], "verbs": ["get", "list"]}])
         m.CoreV1Api.return_value.list_namespace.return_value = {'items': ['boo']}
         with mock.patch("kubernetes.client", m):
             self.assertEqual(kubectl.get("namespaces"), ["boo"])
             m.CoreV1Api().list_namespace.assert_called_once_with(label_selector=None)
 
     def test_list_namespace_wrong_verb(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, "kind": "Namespace", "name": "namespaces", "namespaced": False, "short_names": ["ns"], "verbs": ["create", "delete"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, "kind": "Namespace", "name": "namespaces", "namespaced": False, "short_names": ["ns"], "verbs": ["create", "delete"]}])
         m = mock.Mock()
         m.CoreV1Api.return_value.list_namespace.return_value = {'items': ['boo']}
         with mock.patch("kubernetes.client", m):
@@ -142,18 +295,41 @@ class InitTests(unittest.TestCase):
                 kubectl.get("namespaces")
 
     def test_get_pod(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}])
         m = mock.Mock()
         m.CoreV1Api.return_value.list_namespaced_pod.return_value = {'items': [{
             'metadata': {'name': 'foobar'},
             'metadata': {'name': 'toto'}}]}
         with mock.patch("kubernetes.client", m):
             self.assertEqual(kubectl.get("pod", "toto"), {'metadata': {'name': 'toto'}})
-            m.CoreV1Api().list_namespaced_pod.assert_called_once_with(label_selector=None, namespace='default')
+            m.CoreV1Api().list_namespaced_pod.assert_called_once_with(
+                label_selector=None, namespace='default', field_selector='metadata.name=toto')
+
+    def test_get_pod_from_model(self):
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}])
+        m = mock.Mock()
+        m.CoreV1Api.return_value.list_namespaced_pod.side_effect = [
+            kubernetes.client.V1PodList(items=[
+                kubernetes.client.V1Pod(metadata=kubernetes.client.V1ObjectMeta(name='foobar')),
+                kubernetes.client.V1Pod(metadata=kubernetes.client.V1ObjectMeta(name='toto'))]),
+            kubernetes.client.V1PodList(items=[])]
+        with mock.patch("kubernetes.client", m):
+            self.assertEqual(kubectl.get("pod", "toto")['metadata']['name'], 'toto')
+            self.assertEqual(kubectl.get("pod", "tata"), {})
+
+    def test_get_pod_field_selector_ignored(self):
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}])
+        m = mock.Mock()
+        m.CoreV1Api.return_value.list_namespaced_pod.return_value = {'items': [
+            {'metadata': {'name': 'foobar'}},
+            {'metadata': {'name': 'toto'}}]}
+        with mock.patch("kubernetes.client", m):
+            self.assertEqual(kubectl.get("pod", "toto"), {'metadata': {'name': 'toto'}})
+            self.assertEqual(kubectl.get("pod", "tata"), {})
 
     def test_get_pod_wrong_verb(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "list"]}])
         m.CoreV1Api.return_value.list_namespaced_pod.return_value = {'items': [
             {'metadata': {'name': 'foobar'}},
             {'metadata': {'name': 'toto'}}]}
@@ -162,17 +338,18 @@ class InitTests(unittest.TestCase):
                 kubectl.get("pod", "toto")
 
     def test_get_pod_with_namespace(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}])
         m = mock.Mock()
         m.CoreV1Api.return_value.list_namespaced_pod.return_value = {'items': [
             {'metadata': {'name': 'foobar'}},
             {'metadata': {'name': 'toto'}}]}
         with mock.patch("kubernetes.client", m):
             self.assertEqual(kubectl.get("pod", "toto", "myns"), {'metadata': {'name': 'toto'}})
-            m.CoreV1Api().list_namespaced_pod.assert_called_once_with(label_selector=None, namespace='myns')
+            m.CoreV1Api().list_namespaced_pod.assert_called_once_with(
+                label_selector=None, namespace='myns', field_selector='metadata.name=toto')
 
     def test_get_pod_with_all_namespaces(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}])
         m = mock.Mock()
         m.CoreV1Api.return_value.list_pod_for_all_namespaces.return_value = {'items': [
             {'metadata': {'name': 'foobar'}},
@@ -203,6 +380,7 @@ class InitTests(unittest.TestCase):
             self.assertEqual(kubectl.get("imtf", "sc2"), {'metadata': {'name': 'sc2'}})
             m.CustomObjectsApi().list_cluster_custom_object.assert_called_once_with(
                 label_selector=None,
+                field_selector='metadata.name=sc2',
                 plural='imtfinstances',
                 group='imtf.k8s.io',
                 version='v1')
@@ -227,6 +405,7 @@ class InitTests(unittest.TestCase):
             self.assertEqual(kubectl.get("imtf", "sc2", "current"), {'metadata': {'name': 'sc2'}})
             m.CustomObjectsApi().list_namespaced_custom_object.assert_called_once_with(
                 label_selector=None,
+                field_selector='metadata.name=sc2',
                 plural='imtfinstances',
                 group='imtf.k8s.io',
                 version='v1',
@@ -259,49 +438,51 @@ class InitTests(unittest.TestCase):
                 version='v1')
 
     def test_scale_pod(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list"]}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             with self.assertRaises(kubectl.exceptions.KubectlBaseException):
                 kubectl.scale("pod", "foobar", replicas=2)
 
     def test_scale_deployment_wrong_verb(self):
-        kubectl._resource_cache = [{'kind': 'Deployment', 'name': 'deployments', 'namespaced': True, 'short_names': ['deploy'], 'verbs': ['get', 'list'], 'api': {'name': 'CustomObjectsApi', 'group': 'apps', 'version': 'v1', 'group_version': 'apps/v1'}}]
+        kubectl._index_resources([{'kind': 'Deployment', 'name': 'deployments', 'namespaced': True, 'short_names': ['deploy'], 'verbs': ['get', 'list'], 'api': {'name': 'CustomObjectsApi', 'group': 'apps', 'version': 'v1', 'group_version': 'apps/v1'}}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             with self.assertRaises(kubectl.exceptions.KubectlBaseException):
                 kubectl.scale("deployment", "foobar", replicas=2)
 
     def test_scale_deployment(self):
-        kubectl._resource_cache = [{'kind': 'Deployment', 'name': 'deployments', 'namespaced': True, 'short_names': ['deploy'], 'verbs': ['patch'], 'api': {'name': 'CustomObjectsApi', 'group': 'apps', 'version': 'v1', 'group_version': 'apps/v1'}}]
+        kubectl._index_resources([{'kind': 'Deployment', 'name': 'deployments', 'namespaced': True, 'short_names': ['deploy'], 'verbs': ['patch'], 'api': {'name': 'CustomObjectsApi', 'group': 'apps', 'version': 'v1', 'group_version': 'apps/v1'}}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             kubectl.scale("deploy", "foobar", replicas=2)
             m.AppsV1Api().patch_namespaced_deployment_scale.assert_called_once_with(name='foobar', namespace='default', body={'spec': {'replicas': 2}})
 
     def test_scale_deployment_dry_run(self):
-        kubectl._resource_cache = [{'kind': 'Deployment', 'name': 'deployments', 'namespaced': True, 'short_names': ['deploy'], 'verbs': ['patch'], 'api': {'name': 'CustomObjectsApi', 'group': 'apps', 'version': 'v1', 'group_version': 'apps/v1'}}]
+        kubectl._index_resources([{'kind': 'Deployment', 'name': 'deployments', 'namespaced': True, 'short_names': ['deploy'], 'verbs': ['patch'], 'api': {'name': 'CustomObjectsApi', 'group': 'apps', 'version': 'v1', 'group_version': 'apps/v1'}}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             kubectl.scale("deploy", "foobar", replicas=2, dry_run=True)
             m.AppsV1Api().patch_namespaced_deployment_scale.assert_called_once_with(name='foobar', namespace='default', body={'spec': {'replicas': 2}}, dry_run='All')
 
     def test_delete_pod(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "delete"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "delete"]}])
         m = mock.Mock()
+        kubectl._pod_cache[('default', 'toto')] = (time.monotonic(), (['first'], None))
         with mock.patch("kubernetes.client", m):
             kubectl.delete("pod", "toto")
             m.CoreV1Api().delete_namespaced_pod.assert_called_once_with(name='toto', namespace='default')
+        self.assertNotIn(('default', 'toto'), kubectl._pod_cache)
 
     def test_delete_pod_dry_run(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "delete"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "delete"]}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             kubectl.delete("pod", "toto", dry_run=True)
             m.CoreV1Api().delete_namespaced_pod.assert_called_once_with(name='toto', namespace='default', dry_run='All')
 
     def test_delete_pod_wrong_verb(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "list"]}]        
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "list"]}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             with self.assertRaises(kubectl.exceptions.KubectlBaseException):
@@ -351,7 +532,7 @@ class InitTests(unittest.TestCase):
                 namespace='current')
 
     def test_patch_pod(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             kubectl.patch("pod", "toto", body={'spec': {'serviceAccountName': 'sa'}})
@@ -361,7 +542,7 @@ class InitTests(unittest.TestCase):
                 body={'spec': {'serviceAccountName': 'sa'}, 'metadata': {'namespace': 'default', 'name': 'toto'}, 'apiVersion': 'v1', 'kind': 'Pod'})
 
     def test_patch_pod_dry_run(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             kubectl.patch("pod", "toto", body={'spec': {'serviceAccountName': 'sa'}}, dry_run=True)
@@ -376,7 +557,7 @@ class InitTests(unittest.TestCase):
                 kubectl.patch("pod", body={'spec': {'serviceAccountName': 'sa'}})
 
     def test_patch_pod_with_namespace_parameter(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             kubectl.patch("pod", "toto", namespace='current', body={'metadata': {'namespace': 'test', 'name': 'toto'}, 'spec': {'serviceAccountName': 'sa'}})
@@ -386,7 +567,7 @@ class InitTests(unittest.TestCase):
                 body={'spec': {'serviceAccountName': 'sa'}, 'metadata': {'namespace': 'test', 'name': 'toto'}, 'apiVersion': 'v1', 'kind': 'Pod'})
 
     def test_patch_pod_wrong_verb(self):
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "list"]}])
         m = mock.Mock()
         with mock.patch("kubernetes.client", m):
             with self.assertRaises(kubectl.exceptions.KubectlBaseException):
@@ -439,7 +620,7 @@ class InitTests(unittest.TestCase):
 
     def test_create_pod(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "get", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "get", "list"]}])
         with mock.patch("kubernetes.client", m):
             kubectl.create("pod", "toto", body={'spec': {'serviceAccountName': 'sa'}})
             m.CoreV1Api().create_namespaced_pod.assert_called_once_with(
@@ -448,7 +629,7 @@ class InitTests(unittest.TestCase):
 
     def test_create_pod_dry_run(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "get", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "get", "list"]}])
         with mock.patch("kubernetes.client", m):
             kubectl.create("pod", "toto", body={'spec': {'serviceAccountName': 'sa'}}, dry_run=True)
             m.CoreV1Api().create_namespaced_pod.assert_called_once_with(
@@ -456,13 +637,27 @@ class InitTests(unittest.TestCase):
                 body={'spec': {'serviceAccountName': 'sa'}, 'metadata': {'namespace': 'default', 'name': 'toto'}, 'apiVersion': 'v1', 'kind': 'Pod'},
                 dry_run='All')
 
+    def test_create_configmap(self):
+        m = mock.Mock()
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'ConfigMap', 'name': 'configmaps', "namespaced": True, "short_names": ["cm"], "verbs": ["create", "get", "list"]}])
+        data = {'some_key': 'value'}
+        body = {'metadata': {'labels': {'app': 'toto'}}, 'data': data}
+        with mock.patch("kubernetes.client", m):
+            kubectl.create("cm", "toto", body=body)
+            m.CoreV1Api().create_namespaced_config_map.assert_called_once_with(
+                namespace='default',
+                body={'metadata': {'labels': {'app': 'toto'}, 'namespace': 'default', 'name': 'toto'}, 'data': {'some_key': 'value'}, 'apiVersion': 'v1', 'kind': 'ConfigMap'})
+        # the data is sent as is, without being copied
+        self.assertIs(m.CoreV1Api().create_namespaced_config_map.call_args.kwargs['body']['data'], data)
+        self.assertEqual(body, {'metadata': {'labels': {'app': 'toto'}}, 'data': {'some_key': 'value'}})
+
     def test_create_pod_no_name(self):
             with self.assertRaises(kubectl.exceptions.KubectlResourceNameException):
                 kubectl.create("pod", body={'spec': {'serviceAccountName': 'sa'}})
 
     def test_create_pod_with_namespace_parameter(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "get", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["create", "get", "list"]}])
         with mock.patch("kubernetes.client", m):
             kubectl.create("pod", "toto", namespace='current', body={'metadata': {'namespace': 'test', 'name': 'toto'}, 'spec': {'serviceAccountName': 'sa'}})
             m.CoreV1Api().create_namespaced_pod.assert_called_once_with(
@@ -471,7 +666,7 @@ class InitTests(unittest.TestCase):
 
     def test_create_pod_wrong_verb(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["delete", "list"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["delete", "list"]}])
         with mock.patch("kubernetes.client", m):
             with self.assertRaises(kubectl.exceptions.KubectlBaseException):
                 kubectl.create("pod", "toto", body={'spec': {'serviceAccountName': 'sa'}})
@@ -510,43 +705,67 @@ class InitTests(unittest.TestCase):
                 'namespaced': True, 'short_names': ['imtf'],
                 'verbs': ['get', 'list', 'create']}]
         }
+        body = {'rules': {'users': ['first'], 'service_account_name': 'sa'}, 'metadata': {}}
         with mock.patch("kubernetes.client", m):
-            kubectl.create("imtf", "sc2", "current", body={'rules': {'users': ['first']}})
+            kubectl.create("imtf", "sc2", "current", body=body)
+            self.assertEqual(body, {'rules': {'users': ['first'], 'service_account_name': 'sa'}, 'metadata': {}})
             m.CustomObjectsApi().create_namespaced_custom_object.assert_called_once_with(
-                body={'rules': {'users': ['first']}, 'metadata': {'name': 'sc2', 'namespace': 'current'}, 'apiVersion': 'imtf.k8s.io/v1', 'kind': 'ImtfInstance'},
+                body={'rules': {'users': ['first'], 'serviceAccountName': 'sa'}, 'metadata': {'name': 'sc2', 'namespace': 'current'}, 'apiVersion': 'imtf.k8s.io/v1', 'kind': 'ImtfInstance'},
                 plural='imtfinstances',
                 group='imtf.k8s.io',
                 version='v1',
                 namespace='current')
 
-    def test_apply_patch(self):
+    def test_apply(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
-        m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
-            {"kind": "Pod", "apiVersion": "v1", "metadata": {"name": "nginx"}, "spec": {"containers": [{"image": "nginx"}]}}]}
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         with mock.patch("kubernetes.client", m):
             kubectl.apply(
                 {"kind": "Pod", "apiVersion": "v1", "metadata": {"name": "nginx"}, "spec": {"containers": [{"image": "busybox"}]}})
             m.CoreV1Api().patch_namespaced_pod.assert_called_once_with(
                 name='nginx',
                 body={'kind': 'Pod', 'apiVersion': 'v1', 'metadata': {'name': 'nginx', 'namespace': 'default'}, 'spec': {'containers': [{'image': 'busybox'}]}},
-                namespace='default')
+                namespace='default',
+                field_manager='kubectl-helper')
+            m.CoreV1Api().list_namespaced_pod.assert_not_called()
+            m.CoreV1Api().create_namespaced_pod.assert_not_called()
 
-    def test_apply_create(self):
+    def test_apply_from_get(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "create"]}]
-        m.CoreV1Api().list_namespaced_pod.return_value = {'items': []}
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
+        body = {"kind": "Pod", "api_version": "v1", "metadata": {
+            "name": "nginx", "resource_version": "42", "managed_fields": [{"manager": "kubectl"}]}}
         with mock.patch("kubernetes.client", m):
-            kubectl.apply(
-                {"kind": "Pod", "apiVersion": "v1", "metadata": {"name": "nginx"}, "spec": {"containers": [{"image": "busybox"}]}})
-            m.CoreV1Api().create_namespaced_pod.assert_called_once_with(
-                body={'kind': 'Pod', 'apiVersion': 'v1', 'metadata': {'name': 'nginx', 'namespace': 'default'}, 'spec': {'containers': [{'image': 'busybox'}]}},
-                namespace='default')
+            kubectl.apply(body, force=True)
+            m.CoreV1Api().patch_namespaced_pod.assert_called_once_with(
+                name='nginx',
+                body={'kind': 'Pod', 'apiVersion': 'v1', 'metadata': {'name': 'nginx', 'namespace': 'default'}},
+                namespace='default',
+                field_manager='kubectl-helper',
+                force=True)
+        self.assertEqual(body['metadata']['resource_version'], "42")
+
+    def test_api_shared(self):
+        m = mock.Mock()
+        with mock.patch("kubernetes.client", m):
+            api = kubectl._api('CoreV1Api')
+            self.assertIs(kubectl._api(name='CoreV1Api'), api)
+        m.CoreV1Api.assert_called_once_with(kubectl._api_client())
+
+    def test_apply_content_type(self):
+        client = kubectl._api_client()
+        self.assertIs(kubectl._api_client(), client)
+        with client.server_side_apply():
+            self.assertEqual(
+                client.select_header_content_type(['application/merge-patch+json']),
+                'application/apply-patch+yaml')
+        self.assertEqual(
+            client.select_header_content_type(['application/merge-patch+json']),
+            'application/merge-patch+json')
 
     def test_apply_wrong_verb(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
-        m.CoreV1Api().list_namespaced_pod.return_value = {'items': []}
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "create"]}])
         with mock.patch("kubernetes.client", m):
             with self.assertRaises(kubectl.exceptions.KubectlBaseException):
                 kubectl.apply(
@@ -554,7 +773,7 @@ class InitTests(unittest.TestCase):
 
     def test_annotate(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
             {"kind": "Pod", "apiVersion": "v1", "metadata": {"name": "nginx"}, "spec": {}}]}
         with mock.patch("kubernetes.client", m):
@@ -566,19 +785,19 @@ class InitTests(unittest.TestCase):
 
     def test_annotate_delete(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
             {"kind": "Pod", "apiVersion": "v1", "metadata": {"name": "nginx", "annotations": {"test": "jb", "blah": "plop"}}, "spec": {}}]}
         with mock.patch("kubernetes.client", m):
             kubectl.annotate("pod", "nginx", blah=None)
             m.CoreV1Api().patch_namespaced_pod.assert_called_once_with(
                 name='nginx',
-                body={'apiVersion': 'v1', 'kind': 'Pod', 'metadata': {'name': 'nginx', 'namespace': 'default', 'annotations': {"test": "jb", "blah": None}}},
+                body={'apiVersion': 'v1', 'kind': 'Pod', 'metadata': {'name': 'nginx', 'namespace': 'default', 'annotations': {"blah": None}}},
                 namespace='default')
 
     def test_annotate_no_annotations(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
             {"kind": "Pod", "apiVersion": "v1", "metadata": {"name": "nginx", 'annotations': {'owner': 'imtf', 'user': 'foobar'}}, "spec": {}}]}
         with mock.patch("kubernetes.client", m):
@@ -587,7 +806,7 @@ class InitTests(unittest.TestCase):
 
     def test_annotate_existing(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
             {"kind": "Pod", "apiVersion": "v1", "metadata": {"name": "nginx", 'annotations': {'owner': 'imtf', 'user': 'foobar'}}, "spec": {}}]}
         with mock.patch("kubernetes.client", m):
@@ -596,7 +815,7 @@ class InitTests(unittest.TestCase):
 
     def test_annotate_existing_overwrite(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
             {"kind": "Pod", "apiVersion": "v1", "metadata": {"name": "nginx", 'annotations': {'owner': 'imtf', 'user': 'foobar'}}, "spec": {}}]}
         with mock.patch("kubernetes.client", m):
@@ -605,19 +824,74 @@ class InitTests(unittest.TestCase):
                 name='nginx',
                 body={'apiVersion': 'v1', 'kind': 'Pod', 'metadata': {'name': 'nginx', 'namespace': 'default', 'annotations': {'owner': 'imtf', 'user': 'bar'}}},
                 namespace='default')
+            m.CoreV1Api().list_namespaced_pod.assert_not_called()
 
     def test_wait_for_pod(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m.CoreV1Api().list_namespaced_pod.side_effect = [
         {'items': [{"kind": "Pod", "apiVersion": "v1", "status": {"phase": "Pending"}, "metadata": {"name": "nginx"}, "spec": {}}]},
         {'items': [{"kind": "Pod", "apiVersion": "v1", "status": {"phase": "Running"}, "metadata": {"name": "nginx"}, "spec": {}}]}]
         with mock.patch("kubernetes.client", m):
             self.assertTrue(kubectl.wait("pod", "nginx"))
 
+    def test_wait_for_pod_watch(self):
+        m = mock.Mock()
+        m.rest.ApiException = kubernetes.client.rest.ApiException
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "watch"]}])
+        pending = {"kind": "Pod", "apiVersion": "v1", "status": {"phase": "Pending"}, "metadata": {"name": "nginx"}, "spec": {}}
+        running = {"kind": "Pod", "apiVersion": "v1", "status": {"phase": "Running"}, "metadata": {"name": "nginx"}, "spec": {}}
+        m.CoreV1Api().list_namespaced_pod.return_value = {'items': [pending]}
+        mock_watch = mock.Mock()
+        mock_watch.return_value.stream.side_effect = [
+            iter([{'type': 'ADDED', 'object': mock.Mock(**{'to_dict.return_value': pending})},
+                  {'type': 'BOOKMARK', 'object': running}]),
+            kubernetes.client.rest.ApiException(status=410),
+            iter([{'type': 'MODIFIED', 'object': running}])]
+        with mock.patch("kubernetes.client", m):
+            with mock.patch("kubernetes.watch.Watch", mock_watch):
+                self.assertTrue(kubectl.wait("pod", "nginx"))
+        self.assertEqual(mock_watch.return_value.stream.call_count, 3)
+        mock_watch.return_value.stream.assert_called_with(
+            m.CoreV1Api().list_namespaced_pod,
+            namespace='default',
+            field_selector='metadata.name=nginx',
+            timeout_seconds=mock.ANY)
+        m.CoreV1Api().list_namespaced_pod.assert_called_once()
+
+    def test_wait_for_pod_watch_error(self):
+        m = mock.Mock()
+        m.rest.ApiException = kubernetes.client.rest.ApiException
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "watch"]}])
+        m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
+            {"kind": "Pod", "apiVersion": "v1", "status": {"phase": "Pending"}, "metadata": {"name": "nginx"}, "spec": {}}]}
+        mock_watch = mock.Mock()
+        error = kubernetes.client.rest.ApiException(status=403, reason="Forbidden")
+        error.body = '{"message": "pods is forbidden: User cannot watch pods"}'
+        mock_watch.return_value.stream.side_effect = error
+        with mock.patch("kubernetes.client", m):
+            with mock.patch("kubernetes.watch.Watch", mock_watch):
+                with self.assertRaisesRegex(kubectl.exceptions.KubectlBaseException, "^pods is forbidden"):
+                    kubectl.wait("pod", "nginx")
+
+    def test_wait_for_pod_deleted(self):
+        m = mock.Mock()
+        m.rest.ApiException = kubernetes.client.rest.ApiException
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "watch"]}])
+        pending = {"kind": "Pod", "apiVersion": "v1", "status": {"phase": "Pending"}, "metadata": {"name": "nginx"}, "spec": {}}
+        m.CoreV1Api().list_namespaced_pod.return_value = {'items': [pending]}
+        mock_watch = mock.Mock()
+        mock_watch.return_value.stream.side_effect = [
+            iter([{'type': 'DELETED', 'object': pending}])]
+        with mock.patch("kubernetes.client", m):
+            with mock.patch("kubernetes.watch.Watch", mock_watch):
+                with self.assertRaises(kubectl.exceptions.KubectlBaseException):
+                    kubectl.wait("pod", "nginx")
+        mock_watch.return_value.stream.assert_called_once()
+
     def test_wait_for_pod_wrong_condition(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
             {"kind": "Pod", "apiVersion": "v1", "status": {"phase": "Running"}, "metadata": {"name": "nginx"}, "spec": {}}]}
         with mock.patch("kubernetes.client", m):
@@ -626,7 +900,7 @@ class InitTests(unittest.TestCase):
 
     def test_wait_for_pod_timeout(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
             {"kind": "Pod", "apiVersion": "v1", "status": {"phase": "Running"}, "metadata": {"name": "nginx"}, "spec": {}}]}
         with mock.patch("kubernetes.client", m):
@@ -635,7 +909,7 @@ class InitTests(unittest.TestCase):
 
     def test_wait_for_pod_wrong_type(self):
         m = mock.Mock()
-        kubectl._resource_cache = [{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}]
+        kubectl._index_resources([{'api': {'name': 'CoreV1Api', 'version': 'v1', 'group_version': 'v1'}, 'kind': 'Pod', 'name': 'pods', "namespaced": True, "short_names": ["po"], "verbs": ["get", "list", "patch"]}])
         m.CoreV1Api().list_namespaced_pod.return_value = {'items': [
             {"kind": "Pod", "apiVersion": "v1", "status": {"phase": "Running"}, "metadata": {"name": "nginx"}, "spec": {}}]}
         with mock.patch("kubernetes.client", m):
@@ -657,22 +931,24 @@ class InitTests(unittest.TestCase):
         mock_stream = mock.Mock()
         mock_stream.stream.return_value = mock_ws
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with mock.patch("kubernetes.client", mock_client):
             with mock.patch("kubernetes.stream", mock_stream):
                 with mock.patch("sys.stderr", mock_stderr):
                     with mock.patch("sys.stdout", mock_stdout):
-                        self.assertEqual(kubectl.exec("foobar", "ls -d /", "current", stderr=True, stdout=True), (False, '/usr\n/etc\n/bin\nnot found\n'))
+                        with mock.patch('kubectl.wsclient.update') as mock_update:
+                            self.assertEqual(kubectl.exec("foobar", "ls -d /", "current", stderr=True, stdout=True), (False, '/usr\n/etc\n/bin\nnot found\n'))
                         mock_stderr.write.assert_called_once_with(['not found\n'])
                         mock_stdout.write.assert_called_once_with(['/usr\n', '/etc\n', '/bin\n'])
+                        mock_update.assert_called_once_with(mock_ws, None)
                         mock_stream.stream.assert_called_once_with(
                             'mock_function', 'foobar', 'current', container='first', command='ls -d /',
                             stderr=True, stdin=False, stdout=True, tty=False, _preload_content=False)
@@ -685,14 +961,14 @@ class InitTests(unittest.TestCase):
         mock_stream = mock.Mock()
         mock_stream.stream.return_value = mock_ws
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with mock.patch("kubernetes.client", mock_client):
             with mock.patch("kubernetes.stream", mock_stream):
@@ -710,7 +986,7 @@ class InitTests(unittest.TestCase):
         mock_stream = mock.Mock()
         mock_stream.stream.return_value = mock_ws
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current',
@@ -718,7 +994,7 @@ class InitTests(unittest.TestCase):
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with mock.patch("kubernetes.client", mock_client):
             with mock.patch("kubernetes.stream", mock_stream):
@@ -727,18 +1003,57 @@ class InitTests(unittest.TestCase):
                     'mock_function', 'foobar', 'current', container='second', command='ls -d /',
                     stderr=True, stdin=False, stdout=True, tty=False, _preload_content=False)
 
+    def test_find_container_cached(self):
+        mock_client = mock.Mock()
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
+            'metadata': {'name': 'foobar', 'namespace': 'current'},
+            'spec': {'containers': [{'name': 'first'}, {'name': 'second'}]}})
+        with mock.patch("kubernetes.client", mock_client):
+            self.assertEqual(kubectl._find_container('foobar', 'current'), 'first')
+            self.assertEqual(kubectl._find_container('foobar', 'current', 'second'), 'second')
+            mock_client.CoreV1Api().read_namespaced_pod.assert_called_once_with(
+                name='foobar', namespace='current', _preload_content=False)
+            with mock.patch('kubectl._POD_CACHE_TTL', 0):
+                kubectl._find_container('foobar', 'current')
+            self.assertEqual(mock_client.CoreV1Api().read_namespaced_pod.call_count, 2)
+
+    def test_find_container_recreated_pod(self):
+        mock_client = mock.Mock()
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
+            'metadata': {'name': 'foobar', 'namespace': 'current'},
+            'spec': {'containers': [{'name': 'first'}, {'name': 'second'}]}})
+        kubectl._pod_cache[('current', 'foobar')] = (time.monotonic(), (['first'], None))
+        with mock.patch("kubernetes.client", mock_client):
+            self.assertEqual(kubectl._find_container('foobar', 'current', 'second'), 'second')
+            mock_client.CoreV1Api().read_namespaced_pod.assert_called_once()
+            self.assertEqual(kubectl._find_container('foobar', 'current', 'second'), 'second')
+            mock_client.CoreV1Api().read_namespaced_pod.assert_called_once()
+
+    def test_pod_cache_bounded(self):
+        mock_client = mock.Mock()
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
+            'metadata': {'name': 'foobar', 'namespace': 'current'},
+            'spec': {'containers': [{'name': 'first'}]}})
+        with mock.patch("kubernetes.client", mock_client):
+            with mock.patch('kubectl._POD_CACHE_SIZE', 2):
+                kubectl._find_container('pod1', 'current')
+                kubectl._find_container('pod2', 'current')
+                kubectl._find_container('pod1', 'current')
+                kubectl._find_container('pod3', 'current')
+        self.assertEqual(list(kubectl._pod_cache), [('current', 'pod1'), ('current', 'pod3')])
+
     def test_exec_wrong_container(self):
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
-                'init_containers': [
+                'initContainers': [
                     {'name': 'init'}],
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with mock.patch("kubernetes.client", mock_client):
             with self.assertRaises(kubectl.exceptions.KubectlInvalidContainerException):
@@ -769,14 +1084,14 @@ class InitTests(unittest.TestCase):
 
     def test_logs(self):
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.read_namespaced_pod_log.return_value = '/usr\n/etc\n/bin\n'
         with mock.patch("kubernetes.client", mock_client):
             self.assertEqual(kubectl.logs("foobar", "current"), '/usr\n/etc\n/bin\n')
@@ -785,7 +1100,7 @@ class InitTests(unittest.TestCase):
 
     def test_logs_default_container(self):
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current',
@@ -793,7 +1108,7 @@ class InitTests(unittest.TestCase):
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.read_namespaced_pod_log.return_value = '/usr\n/etc\n/bin\n'
         with mock.patch("kubernetes.client", mock_client):
             self.assertEqual(kubectl.logs("foobar", "current"), '/usr\n/etc\n/bin\n')
@@ -802,14 +1117,14 @@ class InitTests(unittest.TestCase):
 
     def test_logs_not_ready_1(self):
         mock_client = mock.Mock()
-        mock_client.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         exc = kubernetes.client.rest.ApiException()
         exc.body = '{"message": "json"}'
         mock_client.return_value.read_namespaced_pod_log.side_effect = exc
@@ -820,14 +1135,14 @@ class InitTests(unittest.TestCase):
 
     def test_logs_not_ready_2(self):
         mock_client = mock.Mock()
-        mock_client.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         exc = kubernetes.client.rest.ApiException()
         exc.body = 'no_json'
         mock_client.return_value.read_namespaced_pod_log.side_effect = exc
@@ -838,19 +1153,45 @@ class InitTests(unittest.TestCase):
 
     def test_logs_wrong_container(self):
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
-                'init_containers': [
+                'initContainers': [
                     {'name': 'init'}],
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         with mock.patch("kubernetes.client", mock_client):
             with self.assertRaises(kubectl.exceptions.KubectlInvalidContainerException):
                 kubectl.logs("foobar", "current", "another")
+            mock_client.CoreV1Api().read_namespaced_pod_log.return_value.close.assert_called_once_with()
+
+    def test_logs_pod_not_found(self):
+        api_exception = kubernetes.client.rest.ApiException
+        mock_client = mock.Mock()
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.side_effect = api_exception(status=404)
+        with mock.patch("kubernetes.client", mock_client):
+            with self.assertRaises(api_exception):
+                kubectl.logs("foobar", "current", "first")
+            mock_client.CoreV1Api().read_namespaced_pod_log.return_value.close.assert_called_once_with()
+
+    def test_logs_with_container(self):
+        mock_client = mock.Mock()
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
+            'metadata': {
+                'name': 'foobar',
+                'namespace': 'current'},
+            'spec': {
+                'containers': [
+                    {'name': 'first'},
+                    {'name': 'second'}]}})
+        mock_client.CoreV1Api.return_value.read_namespaced_pod_log.return_value = '/usr\n/etc\n/bin\n'
+        with mock.patch("kubernetes.client", mock_client):
+            self.assertEqual(kubectl.logs("foobar", "current", "second"), '/usr\n/etc\n/bin\n')
+            mock_client.CoreV1Api().read_namespaced_pod_log.assert_called_once_with(
+                'foobar', 'current', container='second', follow=False, _preload_content=False)
 
     def test_top(self):
         m = mock.Mock()
@@ -894,21 +1235,37 @@ class InitTests(unittest.TestCase):
         mock_stream = mock.Mock()
         mock_stream.stream.return_value = mock_flow
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with tempfile.NamedTemporaryFile() as local_file:
             with mock.patch('kubectl.exec', mock.MagicMock(return_value=(False, ''))):
                 with mock.patch("kubernetes.client", mock_client):
                     with mock.patch("kubernetes.stream", mock_stream):
-                        kubectl.cp(local_file.name, "nginx:REMOTEFILE")
-                        mock_flow.write_stdin.assert_called_once()
+                        with mock.patch('kubectl.wsclient.update'), mock.patch('kubectl.wsclient.readable', mock.Mock(side_effect=[True, False])) as mock_readable:
+                            kubectl.cp(local_file.name, "nginx:REMOTEFILE")
+                            mock_flow.write_stdin.assert_called_once()
+                            self.assertIsInstance(mock_flow.write_stdin.call_args.args[0], bytes)
+                            self.assertGreater(mock_readable.call_args.args[1], 1)
+                            mock_flow.close.assert_called_once()
+            local_file.write(b'x' * 100000)
+            local_file.flush()
+            mock_flow.reset_mock()
+            with mock.patch('kubectl.exec', mock.MagicMock(return_value=(False, ''))):
+                with mock.patch("kubernetes.client", mock_client):
+                    with mock.patch("kubernetes.stream", mock_stream):
+                        with mock.patch('kubectl.wsclient.update'), mock.patch('kubectl.wsclient.readable', mock.Mock(side_effect=[True, False])):
+                            kubectl.cp(local_file.name, "nginx:REMOTEFILE")
+                            sizes = [len(c.args[0]) for c in mock_flow.write_stdin.call_args_list]
+                            self.assertEqual(sizes[0], 64 * 1024)
+                            self.assertEqual(sum(sizes) % 10240, 0)
+                            self.assertGreater(sum(sizes), 100000)
 
     def test_cp_push_directory(self):
         mock_flow = mock.Mock()
@@ -919,37 +1276,36 @@ class InitTests(unittest.TestCase):
         mock_stream.stream.return_value = mock_flow
         mock_client = mock.Mock()
         mock_tar = mock.Mock()
-        _tmpdir = None
-        with tempfile.TemporaryDirectory() as tmpdir:
-            with open(f"{tmpdir}/test", "wb") as fd:
-                fd.write(b"toto")
-            with tarfile.open("toto.tar", "w") as fd:
-                fd.add(f"{tmpdir}/test")
-            os.unlink(f"{tmpdir}/test")
-            _tmpdir = tmpdir
-        with open("toto.tar", "rb") as fd:
-            mock_flow.read_stdout.return_value = fd.read().decode()
-        os.unlink("toto.tar")
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
-        with mock.patch('kubectl.exec', mock.MagicMock(return_value=(True, ''))):
-            with mock.patch('os.walk', mock.MagicMock(return_value=[(_tmpdir, [], ['test'])])):
-                with mock.patch('os.path.isdir', mock.MagicMock(return_value=True)):
-                    with mock.patch('tarfile.TarFile.add', mock_tar):
-                        with mock.patch("kubernetes.client", mock_client):
-                            with mock.patch("kubernetes.stream", mock_stream):
+        with tempfile.TemporaryDirectory() as _tmpdir:
+            os.mkdir(f"{_tmpdir}/sub")
+            for _file in ("test", "sub/test"):
+                with open(f"{_tmpdir}/{_file}", "wb") as fd:
+                    fd.write(b"toto")
+            with mock.patch('kubectl.exec', mock.MagicMock(return_value=(True, ''))):
+                with mock.patch('tarfile.TarFile.add', mock_tar):
+                    with mock.patch("kubernetes.client", mock_client):
+                        with mock.patch("kubernetes.stream", mock_stream):
+                            with mock.patch('kubectl.wsclient.update'), mock.patch('kubectl.wsclient.readable', mock.Mock(side_effect=[True, False])):
                                 kubectl.cp(_tmpdir + "/", f"nginx:{_tmpdir}/")
                                 mock_flow.write_stdin.assert_called_once()
-                                mock_tar.assert_called_once_with(
-                                    _tmpdir + "/test",
-                                    os.path.join(_tmpdir, os.path.basename(_tmpdir), "./test"))
+                                self.assertCountEqual(mock_tar.mock_calls, [
+                                    mock.call(
+                                        _tmpdir + "/test",
+                                        os.path.join(_tmpdir, os.path.basename(_tmpdir), "./test"),
+                                        recursive=False),
+                                    mock.call(
+                                        _tmpdir + "/sub/test",
+                                        os.path.join(_tmpdir, os.path.basename(_tmpdir), "./sub/test"),
+                                        recursive=False)])
 
     def test_cp_push_stderr(self):
         mock_print = mock.Mock()
@@ -961,22 +1317,23 @@ class InitTests(unittest.TestCase):
         mock_stream = mock.Mock()
         mock_stream.stream.return_value = mock_flow
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with tempfile.NamedTemporaryFile() as local_file:
             with mock.patch('kubectl.exec', mock.MagicMock(return_value=(False, ''))):
                 with mock.patch("kubernetes.client", mock_client):
                     with mock.patch("kubernetes.stream", mock_stream):
-                        with mock.patch("builtins.print", mock_print):
-                            kubectl.cp(local_file.name, "nginx:REMOTEFILE")
-                        mock_print.assert_called_once_with('STDERR: Mocked!')
+                        with mock.patch('kubectl.wsclient.update'), mock.patch('kubectl.wsclient.readable', mock.Mock(side_effect=[True, False])):
+                            with mock.patch("builtins.print", mock_print):
+                                kubectl.cp(local_file.name, "nginx:REMOTEFILE")
+                            mock_print.assert_called_once_with('STDERR: Mocked!')
 
     def test_cp_push_stderr_2(self):
         mock_print = mock.Mock()
@@ -988,22 +1345,23 @@ class InitTests(unittest.TestCase):
         mock_stream = mock.Mock()
         mock_stream.stream.return_value = mock_flow
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with tempfile.NamedTemporaryFile() as local_file:
             with mock.patch('kubectl.exec', mock.MagicMock(return_value=(False, ''))):
                 with mock.patch("kubernetes.client", mock_client):
                     with mock.patch("kubernetes.stream", mock_stream):
-                        with mock.patch("builtins.print", mock_print):
-                            kubectl.cp(local_file.name, "nginx:REMOTEFILE")
-                        mock_print.assert_called_once_with('STDOUT: Mocked!')
+                        with mock.patch('kubectl.wsclient.update'), mock.patch('kubectl.wsclient.readable', mock.Mock(side_effect=[True, False])):
+                            with mock.patch("builtins.print", mock_print):
+                                kubectl.cp(local_file.name, "nginx:REMOTEFILE")
+                            mock_print.assert_called_once_with('STDOUT: Mocked!')
 
     def test_cp_pull(self):
         mock_tar = mock.Mock()
@@ -1017,24 +1375,32 @@ class InitTests(unittest.TestCase):
         os.unlink("toto.tar")
         os.unlink("test")
         mock_stream = mock.Mock()
+        mock_stream.stream.return_value.read_channel.return_value = '{"status": "Success"}'
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with mock.patch('kubectl.exec', mock.MagicMock(return_value=(True, ''))):
             with mock.patch("kubernetes.client", mock_client):
                 with mock.patch("kubernetes.stream", mock_stream):
-                    with mock.patch("kubectl._read_bytes_from_wsclient", mock_ftn):
+                    with mock.patch("kubectl.wsclient.read_bytes", mock_ftn):
                         with mock.patch('tarfile.TarFile.makefile', mock_tar):
-                            kubectl.cp("nginx:/test", "tmp")
+                            with mock.patch('tarfile.open', mock.Mock(wraps=tarfile.open)) as mock_open:
+                                self.assertTrue(kubectl.cp("nginx:/test", "tmp"))
                         self.assertEqual(mock_tar.mock_calls[0].args[0].name, "test")
                         self.assertEqual(mock_tar.mock_calls[0].args[1], "tmp/.")
+                        self.assertEqual(mock_open.call_args.kwargs['bufsize'], 64 * 1024)
+                        self.assertEqual(mock_open.call_args.kwargs['copybufsize'], 64 * 1024)
+                        # the remote tar failed (on another file for instance)
+                        mock_stream.stream.return_value.read_channel.return_value = '{"status": "Failure"}'
+                        with mock.patch('tarfile.TarFile.makefile', mock_tar):
+                            self.assertFalse(kubectl.cp("nginx:/test", "tmp"))
 
     def test_cp_pull_create_directory(self):
         mock_mkdir = mock.Mock()
@@ -1052,22 +1418,23 @@ class InitTests(unittest.TestCase):
             mock_ftn.return_value = (fd.read(), None, True)
         os.unlink("toto.tar")
         mock_stream = mock.Mock()
+        mock_stream.stream.return_value.read_channel.return_value = '{"status": "Success"}'
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with mock.patch('kubectl.exec', mock.MagicMock(return_value=(True, ''))):
             with mock.patch('os.mkdir', mock_mkdir):
                 with mock.patch('os.path.isdir', mock.MagicMock(return_value=False)):
                     with mock.patch("kubernetes.client", mock_client):
                         with mock.patch("kubernetes.stream", mock_stream):
-                            with mock.patch("kubectl._read_bytes_from_wsclient", mock_ftn):
+                            with mock.patch("kubectl.wsclient.read_bytes", mock_ftn):
                                 with mock.patch('tarfile.TarFile.makefile', mock_tar):
                                     kubectl.cp("nginx:" + _tmpdir, _tmpdir)
                                 mock_mkdir.assert_called_once_with(_tmpdir)
@@ -1087,20 +1454,21 @@ class InitTests(unittest.TestCase):
         os.unlink("toto.tar")
         os.unlink("test")
         mock_stream = mock.Mock()
+        mock_stream.stream.return_value.read_channel.return_value = '{"status": "Success"}'
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with mock.patch('kubectl.exec', mock.MagicMock(return_value=(True, ''))):
             with mock.patch("kubernetes.client", mock_client):
                 with mock.patch("kubernetes.stream", mock_stream):
-                    with mock.patch("kubectl._read_bytes_from_wsclient", mock_ftn):
+                    with mock.patch("kubectl.wsclient.read_bytes", mock_ftn):
                         with mock.patch('tarfile.TarFile.makefile', mock_tar):
                             with mock.patch("builtins.print", mock_print):
                                 kubectl.cp("nginx:/test", "tmp")
@@ -1108,16 +1476,40 @@ class InitTests(unittest.TestCase):
                         self.assertEqual(mock_tar.mock_calls[0].args[1], "tmp/.")
                         mock_print.assert_called_once_with("STDERR: Mocked!")
 
+    def test_cp_pull_stderr_failed(self):
+        mock_ftn = mock.Mock()
+        mock_print = mock.Mock()
+        mock_ftn.return_value = (b"", b"No such file", True)
+        mock_stream = mock.Mock()
+        mock_stream.stream.return_value.read_channel.return_value = '{"status": "Success"}'
+        mock_client = mock.Mock()
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
+            'metadata': {
+                'name': 'foobar',
+                'namespace': 'current'},
+            'spec': {
+                'containers': [
+                    {'name': 'first'}]}})
+        with mock.patch('kubectl.exec', mock.MagicMock(return_value=(True, ''))):
+            with mock.patch("kubernetes.client", mock_client):
+                with mock.patch("kubernetes.stream", mock_stream):
+                    with mock.patch("kubectl.wsclient.read_bytes", mock_ftn):
+                        with mock.patch("builtins.print", mock_print):
+                            with self.assertRaises(tarfile.ReadError):
+                                kubectl.cp("nginx:/test", "tmp")
+        mock_print.assert_called_once_with("STDERR: No such file")
+        mock_stream.stream.return_value.close.assert_called_once_with()
+
     def test_cp_wrong_container(self):
         mock_client = mock.Mock()
-        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.to_dict.return_value = {
+        mock_client.CoreV1Api.return_value.read_namespaced_pod.return_value.data = json.dumps({
             'metadata': {
                 'name': 'foobar',
                 'namespace': 'current'},
             'spec': {
                 'containers': [
                     {'name': 'first'},
-                    {'name': 'second'}]}}
+                    {'name': 'second'}]}})
         mock_client.CoreV1Api.return_value.connect_get_namespaced_pod_exec = 'mock_function'
         with mock.patch("kubernetes.client", mock_client):
             with self.assertRaises(kubectl.exceptions.KubectlInvalidContainerException):
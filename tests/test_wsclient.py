@@ -0,0 +1,92 @@
+import io
+import os
+import sys
+import socket
+from unittest import mock
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__))))
+
+import kubernetes.stream
+from kubectl import wsclient
+
+
+class WSClientTests(unittest.TestCase):
+
+    def test_wsclient_readable(self):
+        local, remote = socket.socketpair()
+        with local, remote:
+            ws_client = mock.Mock()
+            ws_client.sock.sock = local
+            self.assertFalse(wsclient.readable(ws_client))
+            remote.send(b'data')
+            self.assertTrue(wsclient.readable(ws_client, 1))
+            self.assertIn(ws_client, wsclient._selectors)
+
+    def test_wsclient_reader(self):
+        mock_ftn = mock.Mock(side_effect=[(b"abc", None, False), (None, b"err1 ", False), (b"def", b"err2", True)])
+        with mock.patch("kubectl.wsclient.read_bytes", mock_ftn):
+            reader = wsclient.Reader(mock.Mock())
+            self.assertEqual(reader.read(2), b"ab")
+            self.assertEqual(reader.read(3), b"cde")
+            self.assertEqual(reader.read(), b"f")
+            self.assertEqual(reader.read(10), b"")
+        self.assertEqual(mock_ftn.call_count, 3)
+        self.assertEqual(reader.stderr, b"err1 err2")
+
+    def test_wsclient_writer(self):
+        mock_print = mock.Mock()
+        mock_ws = mock.Mock()
+        mock_ws.peek_stdout.return_value = False
+        mock_ws.peek_stderr.side_effect = [True, False]
+        mock_ws.read_stderr.return_value = "Mocked!"
+        writer = wsclient.Writer(mock_ws)
+        with mock.patch("builtins.print", mock_print):
+            with mock.patch("kubectl.wsclient.update") as mock_update:
+                self.assertEqual(writer.write(memoryview(b"abc")), 3)
+                mock_print.assert_called_once_with('STDERR: Mocked!')
+                self.assertEqual(writer.write(b"def"), 3)
+                mock_print.assert_called_once()
+        mock_ws.write_stdin.assert_has_calls([mock.call(b"abc"), mock.call(b"def")])
+        mock_update.assert_has_calls([mock.call(mock_ws), mock.call(mock_ws)])
+
+    def _ws_client(self, frames, binary=False):
+        ws_client = kubernetes.stream.ws_client.WSClient.__new__(
+            kubernetes.stream.ws_client.WSClient)
+        ws_client._connected = True
+        ws_client._channels = {}
+        ws_client.binary = binary
+        ws_client._all = io.BytesIO() if binary else io.StringIO()
+        ws_client.sock = mock.Mock()
+        ws_client.sock.recv_data_frame.side_effect = [
+            (0x2, mock.Mock(data=frame)) for frame in frames]
+        return ws_client
+
+    def test_wsclient_update(self):
+        ws_client = self._ws_client([b'\x01abc', b'\x02err', b'\x03{"status": "Success"}'])
+        # frames held in the TLS buffer are reported readable and read directly
+        with mock.patch("kubectl.wsclient.readable", mock.Mock(return_value=True)) as mock_readable:
+            for _ in range(3):
+                wsclient.update(ws_client, None)
+        mock_readable.assert_called_with(ws_client, None)
+        self.assertEqual(ws_client._channels, {1: 'abc', 2: 'err', 3: '{"status": "Success"}'})
+        self.assertEqual(ws_client._all.getvalue(), 'abcerr')
+
+    def test_wsclient_update_nothing(self):
+        ws_client = self._ws_client([])
+        with mock.patch("kubectl.wsclient.readable", mock.Mock(return_value=False)):
+            wsclient.update(ws_client)
+        ws_client.sock.recv_data_frame.assert_not_called()
+        self.assertEqual(ws_client._channels, {})
+
+
+    def test_wsclient_read_bytes(self):
+        ws_client = self._ws_client([b'\x01abc', b'\x03{"status": "Success"}'], binary=True)
+        with mock.patch("kubectl.wsclient.readable", mock.Mock(return_value=True)):
+            self.assertEqual(wsclient.read_bytes(ws_client), (b'abc', None, False))
+            self.assertEqual(wsclient.read_bytes(ws_client), (None, None, False))
+        # the command status is kept for the caller
+        self.assertEqual(ws_client._channels, {3: b'{"status": "Success"}'})
+
+if __name__ == "__main__":
+    unittest.main()